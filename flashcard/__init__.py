@@ -1,4 +1,101 @@
-def createApp(dbPath: str):
+def defaultConfig(dbPath: str) -> dict:
+    from . import database
+    from . import metrics
+
+    return {
+        "DATABASE_PATH": dbPath,
+        "DATABASE_POOL_SIZE": database.DEFAULT_POOL_SIZE,
+        "DATABASE_POOL_TIMEOUT": database.DEFAULT_POOL_TIMEOUT,
+        "DATABASE_PRAGMAS": dict(database.DEFAULT_PRAGMAS),
+        "DATABASE_LOCK_RETRIES": database.DEFAULT_LOCK_RETRIES,
+        "DATABASE_READ_ONLY_GETS": False,
+        "CACHE_ENABLED": True,
+        "CACHE_MAX_ENTRIES": database.DEFAULT_CACHE_ENTRIES,
+        "CACHE_MAX_BYTES": database.DEFAULT_CACHE_BYTES,
+        "CACHE_TTL": database.DEFAULT_CACHE_TTL,
+        "CACHE_WATCH_INTERVAL": None,
+        "ACCESS_TIME_ENABLED": True,
+        "ACCESS_TIME_FLUSH_INTERVAL": database.DEFAULT_FLUSH_INTERVAL,
+        "ACCESS_TIME_FLUSH_SIZE": database.DEFAULT_FLUSH_SIZE,
+        "WRITER_ENABLED": True,
+        "WRITER_MAX_BATCH": database.DEFAULT_WRITE_BATCH,
+        "METRICS_ENABLED": False,
+        "METRICS_BUCKETS": metrics.DEFAULT_BUCKETS,
+        "METRICS_SLOW_QUERY": metrics.DEFAULT_SLOW_QUERY,
+    }
+
+def createMetrics(config):
+    from . import metrics
+
+    if not config["METRICS_ENABLED"]:
+        return None
+
+    return metrics.Metrics(config["METRICS_BUCKETS"],
+                           config["METRICS_SLOW_QUERY"])
+
+def createPool(config, size: int, registry, readOnly: bool=False):
+    from . import database
+
+    return database.ConnectionPool(config["DATABASE_PATH"],
+                                   size=size,
+                                   pragmas=config["DATABASE_PRAGMAS"],
+                                   timeout=config["DATABASE_POOL_TIMEOUT"],
+                                   metrics=registry,
+                                   readOnly=readOnly,
+                                   retries=config["DATABASE_LOCK_RETRIES"])
+
+def createExtensions(config, pool, registry) -> dict:
+    """ Build the cache, the access time buffer and the writer of an app
+
+    Background threads write through `pool`. With CACHE_WATCH_INTERVAL, the
+    cache is also cleared when another process changes the database.
+    """
+
+    from . import database
+    from . import metrics
+    import atexit
+
+    if config["CACHE_ENABLED"]:
+        cache = database.WordCache(config["CACHE_MAX_ENTRIES"],
+                                   config["CACHE_MAX_BYTES"],
+                                   config["CACHE_TTL"])
+    else:
+        cache = None
+
+    if registry is not None and cache is not None:
+        registry.addCollector(metrics.cacheCollector(cache))
+
+    if cache is not None and config["CACHE_WATCH_INTERVAL"] is not None:
+        changeWatcher = database.ChangeWatcher(pool, cache,
+                                               config["CACHE_WATCH_INTERVAL"])
+        atexit.register(changeWatcher.close)
+    else:
+        changeWatcher = None
+
+    if config["ACCESS_TIME_ENABLED"]:
+        accessTimes = database.AccessTimeBuffer(
+            pool, cache,
+            config["ACCESS_TIME_FLUSH_INTERVAL"],
+            config["ACCESS_TIME_FLUSH_SIZE"])
+        atexit.register(accessTimes.close)
+    else:
+        accessTimes = None
+
+    if config["WRITER_ENABLED"]:
+        writer = database.WordWriter(pool, config["WRITER_MAX_BATCH"])
+        atexit.register(writer.close)
+    else:
+        writer = None
+
+    return {
+        "flashcard.metrics": registry,
+        "flashcard.cache": cache,
+        "flashcard.accessTimes": accessTimes,
+        "flashcard.writer": writer,
+        "flashcard.changeWatcher": changeWatcher,
+    }
+
+def createApp(dbPath: str, config: dict | None=None):
     from . import route
     import flask
     import os
@@ -10,8 +107,91 @@ def createApp(dbPath: str):
     app = flask.Flask(__name__, static_folder=staticDir,
                                 template_folder=templateDir)
 
-    app.config["DATABASE_PATH"] = dbPath
+    app.config.update(defaultConfig(dbPath))
+
+    if config is not None:
+        app.config.update(config)
+
+    registry = createMetrics(app.config)
+    pool = createPool(app.config, app.config["DATABASE_POOL_SIZE"], registry)
+
+    app.extensions["flashcard.pool"] = pool
+    app.extensions.update(createExtensions(app.config, pool, registry))
+
+    # GET and HEAD requests read through connections that cannot write
+    if app.config["DATABASE_READ_ONLY_GETS"]:
+        app.extensions["flashcard.readPool"] = createPool(
+            app.config, app.config["DATABASE_POOL_SIZE"], registry,
+            readOnly=True)
+
+    app.teardown_appcontext(route.releaseConnection)
+
+    if registry is not None:
+        app.before_request(route.startRequestTimer)
+        app.after_request(route.recordRequestTime)
+        app.add_url_rule("/metrics", view_func=route.metrics)
 
     app.register_blueprint(route.blueprint)
 
     return app
+
+def createAsgiApp(dbPath: str, config: dict | None=None):
+    """ Build an ASGI app serving the routes of `createApp` asynchronously
+
+    Reads and writes run on separate thread pools with separate connection
+    pools, sized by ASYNC_READERS and ASYNC_WRITERS; with
+    DATABASE_READ_ONLY_GETS, the read connections are read-only. It needs
+    Quart.
+    """
+
+    from . import asgi
+    import atexit
+    import concurrent.futures
+    import os
+    import quart
+
+    packageDir = os.path.dirname(os.path.abspath(__file__))
+    staticDir = os.path.join(packageDir, "static")
+    templateDir = os.path.join(packageDir, "template")
+
+    app = quart.Quart(__name__, static_folder=staticDir,
+                                template_folder=templateDir)
+
+    app.config.update(defaultConfig(dbPath))
+    app.config["ASYNC_READERS"] = asgi.DEFAULT_READERS
+    app.config["ASYNC_WRITERS"] = asgi.DEFAULT_WRITERS
+
+    if config is not None:
+        app.config.update(config)
+
+    readers = app.config["ASYNC_READERS"]
+    writers = app.config["ASYNC_WRITERS"]
+
+    registry = createMetrics(app.config)
+    # One more connection each for the writer, access time and change
+    # watcher threads. It migrates the database, so it comes first.
+    writePool = createPool(app.config, writers + 3, registry)
+    readPool = createPool(app.config, readers, registry,
+                          readOnly=app.config["DATABASE_READ_ONLY_GETS"])
+
+    readExecutor = concurrent.futures.ThreadPoolExecutor(
+        readers, thread_name_prefix="flashcard-read")
+    writeExecutor = concurrent.futures.ThreadPoolExecutor(
+        writers, thread_name_prefix="flashcard-write")
+    atexit.register(readExecutor.shutdown)
+    atexit.register(writeExecutor.shutdown)
+
+    app.extensions["flashcard.pool"] = readPool
+    app.extensions["flashcard.writePool"] = writePool
+    app.extensions["flashcard.readExecutor"] = readExecutor
+    app.extensions["flashcard.writeExecutor"] = writeExecutor
+    app.extensions.update(createExtensions(app.config, writePool, registry))
+
+    if registry is not None:
+        app.before_request(asgi.startRequestTimer)
+        app.after_request(asgi.recordRequestTime)
+        app.add_url_rule("/metrics", view_func=asgi.metrics)
+
+    app.register_blueprint(asgi.blueprint)
+
+    return app
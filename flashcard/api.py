@@ -0,0 +1,219 @@
+""" The parts of the HTTP API that do not depend on the web framework
+
+`route` (Flask) and `asgi` (Quart) share the parsing and checking of
+request arguments and payloads, and the building of cache validators. Both
+frameworks are built on Werkzeug, so the functions here take its argument
+dicts, Accept headers, requests and responses, and reject bad requests with
+the Werkzeug 400 error that both answer.
+"""
+
+from . import database
+import datetime
+import json
+import werkzeug.exceptions
+
+PAGE_LIMIT = 1000
+
+BATCH_LIMIT = 1000
+
+NDJSON_MIMETYPE = "application/x-ndjson"
+
+METRICS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+SYNC_LIMIT = 5000
+
+DISTANCE_LIMIT = 3
+
+STATS_DAYS_LIMIT = 3660
+
+READ_METHODS = ("GET", "HEAD")
+
+def badRequest(message: str):
+    werkzeug.exceptions.abort(400, message)
+
+def checkMax(max: int) -> int:
+    # A negative LIMIT would not limit at all
+    if not 0 < max <= PAGE_LIMIT:
+        badRequest(f"max must be between 1 and {PAGE_LIMIT}")
+
+    return max
+
+def checkCount(n: int) -> int:
+    if not 0 < n <= BATCH_LIMIT:
+        badRequest(f"n must be between 1 and {BATCH_LIMIT}")
+
+    return n
+
+def parseIds(ids: str) -> list:
+    try:
+        wordIds = [int(wordId) for wordId in ids.split(",") if wordId]
+    except ValueError:
+        badRequest("ids must be a comma-separated list of integers")
+
+    if len(wordIds) > BATCH_LIMIT:
+        badRequest(f"at most {BATCH_LIMIT} ids are allowed")
+
+    return wordIds
+
+def checkBatch(items) -> list:
+    """ Check the parsed JSON body of a batch request """
+
+    if not isinstance(items, list):
+        badRequest("expected a JSON array")
+
+    if len(items) > BATCH_LIMIT:
+        badRequest(f"at most {BATCH_LIMIT} items are allowed")
+
+    return items
+
+def checkWordIds(items: list) -> list:
+    if not all(database.isInteger(wordId) for wordId in items):
+        badRequest("expected a JSON array of word ids")
+
+    return items
+
+def searchArgs(args) -> tuple:
+    q = args.get("q", default="", type=str)
+    max = checkMax(args.get("max", default=10, type=int))
+
+    return q, max
+
+def syncArgs(args) -> tuple:
+    since = args.get("since", default=None, type=str)
+    max = args.get("max", default=500, type=int)
+
+    if not 0 < max <= SYNC_LIMIT:
+        badRequest(f"max must be between 1 and {SYNC_LIMIT}")
+
+    return since, max
+
+def statsArgs(args) -> int:
+    days = args.get("days", default=database.DEFAULT_STATS_DAYS, type=int)
+
+    if not 0 <= days <= STATS_DAYS_LIMIT:
+        badRequest(f"days must be between 0 and {STATS_DAYS_LIMIT}")
+
+    return days
+
+def reviewArgs(args) -> int:
+    return checkCount(args.get("n", default=20, type=int))
+
+def listArgs(args) -> tuple:
+    """ Parse the arguments of GET /words """
+
+    max = args.get("max", default=None, type=int)
+    sort = args.get("sort", default="time", type=str)
+    order = args.get("order", default="asc", type=str)
+    after = args.get("after", default=None, type=str)
+
+    ids = args.get("ids", default=None, type=str)
+    stream = args.get("stream", default=0, type=int)
+
+    # Without max, a page has 10 words and a stream has them all
+    if max is not None:
+        checkMax(max)
+
+    return max, sort, order, after, ids, stream
+
+def suggestArgs(args) -> tuple:
+    prefix = args.get("prefix", default="", type=str)
+    max = checkMax(args.get("max", default=10, type=int))
+
+    return prefix, max
+
+def similarArgs(args) -> tuple:
+    word = args.get("word", default="", type=str)
+    distance = args.get("distance", default=database.DEFAULT_MAX_DISTANCE,
+                        type=int)
+    max = checkMax(args.get("max", default=10, type=int))
+
+    # Every word is within a large enough distance of any other
+    if not 0 <= distance <= DISTANCE_LIMIT:
+        badRequest(f"distance must be between 0 and {DISTANCE_LIMIT}")
+
+    return word, distance, max
+
+def randomArgs(args) -> tuple:
+    n = checkCount(args.get("n", default=10, type=int))
+    seed = args.get("seed", default=None, type=int)
+    having = args.get("having", default=None, type=str)
+
+    if having not in database.SAMPLE_FILTERS:
+        badRequest(f"unknown filter: {having}")
+
+    return n, seed, having
+
+def prefersNdjson(accept) -> bool:
+    return accept.best_match(["application/json",
+                              NDJSON_MIMETYPE]) == NDJSON_MIMETYPE
+
+def ndjsonLines(words: list) -> str:
+    return "".join(json.dumps(word) + "\n" for word in words)
+
+def requestLabels(request, response) -> tuple:
+    """ Label a request by its route pattern, so ids do not add series """
+
+    rule = request.url_rule
+    return (
+        ("route", rule.rule if rule is not None else "unmatched"),
+        ("method", request.method),
+        ("status", str(response.status_code)),
+    )
+
+def notModified(request, etag: str, lastModified: int) -> bool:
+    """ Check the request's validators against the current ones """
+
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+
+    if request.if_modified_since is not None:
+        lastModified = datetime.datetime.fromtimestamp(lastModified,
+                                                       datetime.timezone.utc)
+        return lastModified <= request.if_modified_since
+
+    return False
+
+def setValidators(response, etag: str, lastModified: int):
+    """ Send the validators of a full or 304 response
+
+    ETags are weak since accessTime may differ between two responses that
+    are otherwise the same. Last-Modified is only sent once its second has
+    passed, so that a later change within that second cannot be missed.
+    """
+
+    response.set_etag(etag, weak=True)
+    response.vary.add("Accept")
+
+    now = int(datetime.datetime.now(datetime.timezone.utc).timestamp())
+    if lastModified < now:
+        response.last_modified = lastModified
+
+    return response
+
+def statsValidators(days: int, stats: dict) -> tuple:
+    # The window of days moves at midnight even without changes
+    today = datetime.datetime.now(datetime.timezone.utc).date()
+    etag = f"stats-{days}-{today.isoformat()}-{stats['changeCount']}"
+
+    return etag, stats["changeTime"]
+
+def listValidators(state: dict, sort: str) -> tuple:
+    """ Return the ETag and Last-Modified time of a page of words
+
+    Flushed access times reorder the words sorted by access time without
+    changing any of them, so that order also depends on the access flushes.
+    """
+
+    etag = f"words-{state['changeCount']}"
+    lastModified = state["changeTime"]
+
+    if database.SORT_ALIASES.get(sort, sort) == "access":
+        etag += f"-{state['accessCount']}"
+        lastModified = max(lastModified, state["accessTime"])
+
+    return etag, lastModified
+
+def wordValidators(wordId: int, state: dict) -> tuple:
+    etag = f"word-{wordId}-{state['modificationTime']}-{state['changeCount']}"
+
+    return etag, state["changeTime"]
@@ -0,0 +1,269 @@
+""" The routes of `route` as async handlers, for ASGI servers
+
+Usage:
+
+    hypercorn "flashcard:createAsgiApp('/path/to/word.db')"
+
+Handlers never run SQLite on the event loop. Reads go to a pool of reader
+threads with their own connections, and writes to a separate pool of writer
+threads and connections. A slow write therefore never holds a thread or
+connection that a read is waiting for, and in WAL mode the write does not
+block reads at the database level either. Idle client connections cost no
+thread at all. The synchronous app of `createApp` is unaffected.
+"""
+
+from . import api
+from . import database
+import asyncio
+import functools
+import json
+import quart
+import time
+
+blueprint = quart.Blueprint("blueprint", __name__)
+
+DEFAULT_READERS = database.DEFAULT_POOL_SIZE
+
+DEFAULT_WRITERS = 1
+
+def connection(poolKey: str) -> database.Connection:
+    app = quart.current_app
+    extensions = app.extensions
+
+    return database.Connection(app.config["DATABASE_PATH"],
+                               extensions[poolKey],
+                               extensions["flashcard.cache"],
+                               extensions["flashcard.accessTimes"],
+                               extensions["flashcard.writer"])
+
+async def runOn(executorKey: str, function, *args):
+    executor = quart.current_app.extensions[executorKey]
+    loop = asyncio.get_running_loop()
+
+    return await loop.run_in_executor(executor,
+                                      functools.partial(function, *args))
+
+async def read(method: str, *args):
+    """ Call a `database.Connection` method on the reader threads """
+
+    dbConn = connection("flashcard.pool")
+    return await runOn("flashcard.readExecutor", getattr(dbConn, method),
+                       *args)
+
+async def write(method: str, *args):
+    """ Call a `database.Connection` method on the writer threads """
+
+    dbConn = connection("flashcard.writePool")
+    return await runOn("flashcard.writeExecutor", getattr(dbConn, method),
+                       *args)
+
+def jsonResponse(result):
+    response = quart.current_app.response_class(
+        response=json.dumps(result),
+        mimetype="application/json",
+    )
+    return response
+
+def startRequestTimer():
+    quart.g.requestStartTime = time.perf_counter()
+
+def recordRequestTime(response):
+    startTime = quart.g.pop("requestStartTime", None)
+    if startTime is None:
+        return response
+
+    registry = quart.current_app.extensions["flashcard.metrics"]
+    registry.observe("flashcard_request_seconds",
+                     api.requestLabels(quart.request, response),
+                     time.perf_counter() - startTime)
+
+    return response
+
+async def metrics():
+    registry = quart.current_app.extensions["flashcard.metrics"]
+
+    response = quart.current_app.response_class(
+        response=registry.render(),
+        content_type=api.METRICS_CONTENT_TYPE,
+    )
+    return response
+
+async def conditionalResponse(etag: str, lastModified: int, build):
+    """ Like `route.conditionalResponse`, with `build` a coroutine function """
+
+    if api.notModified(quart.request, etag, lastModified):
+        response = quart.current_app.response_class("", status=304)
+    else:
+        response = await build()
+
+    return api.setValidators(response, etag, lastModified)
+
+@blueprint.route("/")
+async def index():
+    response = await quart.render_template("index.html")
+    return response
+
+@blueprint.route("/search", methods=["GET"])
+async def search():
+    q, max = api.searchArgs(quart.request.args)
+
+    hits = await read("searchText", q, max)
+    return jsonResponse(hits)
+
+@blueprint.route("/sync", methods=["GET"])
+async def sync():
+    since, max = api.syncArgs(quart.request.args)
+
+    try:
+        changes = await read("fetchChanges", since, max)
+    except ValueError as e:
+        quart.abort(400, str(e))
+
+    return jsonResponse(changes)
+
+@blueprint.route("/stats", methods=["GET"])
+async def stats():
+    days = api.statsArgs(quart.request.args)
+
+    result = await read("fetchStats", days)
+
+    async def build():
+        return jsonResponse(result)
+
+    etag, lastModified = api.statsValidators(days, result)
+    return await conditionalResponse(etag, lastModified, build)
+
+@blueprint.route("/review/next", methods=["GET"])
+async def review_next():
+    n = api.reviewArgs(quart.request.args)
+
+    cards = await read("fetchDueCards", n)
+    return jsonResponse(cards)
+
+@blueprint.route("/review/answer", methods=["POST"])
+async def review_answer():
+    answers = api.checkBatch(await quart.request.get_json(silent=True))
+
+    result = await write("answerCards", answers)
+    return jsonResponse(result)
+
+async def streamWords(sort: str, order: str, after: str | None,
+                      max: int | None):
+    """ Stream NDJSON, reading every chunk on the reader threads """
+
+    chunks = connection("flashcard.pool").iterWords(sort, order, after, max)
+    try:
+        first = await runOn("flashcard.readExecutor", next, chunks, [])
+    except ValueError as e:
+        quart.abort(400, str(e))
+
+    # The request context is gone once the body is being sent
+    executor = quart.current_app.extensions["flashcard.readExecutor"]
+
+    async def generate():
+        loop = asyncio.get_running_loop()
+        try:
+            chunk = first
+            while chunk:
+                yield api.ndjsonLines(chunk)
+                chunk = await loop.run_in_executor(executor, next, chunks, [])
+        finally:
+            await loop.run_in_executor(executor, chunks.close)
+
+    response = quart.current_app.response_class(
+        response=generate(),
+        mimetype=api.NDJSON_MIMETYPE,
+    )
+    return response
+
+@blueprint.route("/words", methods=["GET", "POST"])
+async def words():
+    max, sort, order, after, ids, stream = api.listArgs(quart.request.args)
+    stream = stream or api.prefersNdjson(quart.request.accept_mimetypes)
+
+    method = quart.request.method
+    if method == "GET" and stream:
+        return await streamWords(sort, order, after, max)
+    elif method == "GET" and ids is not None:
+        result = await read("fetchWordsByIds", api.parseIds(ids))
+        return jsonResponse(result)
+    elif method == "GET":
+        async def build():
+            try:
+                page = await read("fetchWordsPage", 10 if max is None else max,
+                                  sort, order, after)
+            except ValueError as e:
+                quart.abort(400, str(e))
+
+            response = jsonResponse(page["words"])
+            if page["next"] is not None:
+                response.headers["X-Next-Cursor"] = page["next"]
+            return response
+
+        state = await read("fetchChangeState")
+        etag, lastModified = api.listValidators(state, sort)
+        return await conditionalResponse(etag, lastModified, build)
+    else:
+        word = await quart.request.get_json()
+        result = await write("insertWord", word)
+        return jsonResponse(result)
+
+@blueprint.route("/words:batch", methods=["POST", "DELETE"])
+async def words_batch():
+    items = api.checkBatch(await quart.request.get_json(silent=True))
+
+    method = quart.request.method
+    if method == "POST":
+        result = await write("insertWords", items)
+    else:
+        result = await write("deleteWordsById", api.checkWordIds(items))
+
+    return jsonResponse(result)
+
+@blueprint.route("/words/suggest", methods=["GET"])
+async def words_suggest():
+    prefix, max = api.suggestArgs(quart.request.args)
+
+    words = await read("suggestWords", prefix, max)
+    return jsonResponse(words)
+
+@blueprint.route("/words/similar", methods=["GET"])
+async def words_similar():
+    word, distance, max = api.similarArgs(quart.request.args)
+
+    words = await read("searchSimilarWords", word, distance, max)
+    return jsonResponse(words)
+
+@blueprint.route("/words/random", methods=["GET"])
+async def words_random():
+    n, seed, having = api.randomArgs(quart.request.args)
+
+    words = await read("sampleWords", n, seed, having)
+    return jsonResponse(words)
+
+@blueprint.route("/words/details", methods=["GET"])
+async def words_details():
+    ids = quart.request.args.get("ids", default="", type=str)
+
+    words = await read("fetchWordsDetail", api.parseIds(ids))
+    return jsonResponse(words)
+
+@blueprint.route("/words/<int:wordId>", methods=["GET", "PUT", "DELETE"])
+async def words_detail(wordId: int):
+    dbPath = quart.current_app.config["DATABASE_PATH"]
+
+    method = quart.request.method
+    if method == "GET":
+        async def build():
+            result = await read("fetchWordDetail", wordId)
+            return jsonResponse(result)
+
+        state = await read("fetchChangeState", wordId)
+        etag, lastModified = api.wordValidators(wordId, state)
+        return await conditionalResponse(etag, lastModified, build)
+    elif method == "DELETE":
+        await write("deleteWordById", wordId)
+
+    # PUT is accepted and ignored, and both answer the database path, as
+    # the routes of `route` do
+    return dbPath
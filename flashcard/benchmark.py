@@ -0,0 +1,336 @@
+""" Benchmark the database layer and the HTTP routes on a synthetic dictionary
+
+Usage:
+
+    python -m flashcard.benchmark DB_PATH [--words N] [--seed N]
+                                  [--samples N] [--threads N]
+                                  [--requests N] [--skip-routes]
+                                  [--output PATH]
+
+DB_PATH must not exist yet; it is created, filled with N generated words
+(10000 by default, 100000 or 1000000 for larger runs) and left in place
+afterwards. The same seed always generates the same dictionary and the same
+sequence of operations. Results are written as JSON, with the latency
+percentiles of every operation in milliseconds, to --output or stdout.
+"""
+
+from . import database
+import argparse
+import concurrent.futures
+import json
+import os
+import platform
+import random
+import sqlite3
+import sys
+import threading
+import time
+
+LETTERS = "abcdefghijklmnopqrstuvwxyz"
+
+ONSETS = ["", "b", "bl", "br", "c", "ch", "cl", "cr", "d", "dr", "f", "fl",
+          "fr", "g", "gl", "gr", "h", "j", "k", "l", "m", "n", "p", "pl", "pr",
+          "qu", "r", "s", "sh", "sk", "sl", "sm", "sn", "sp", "st", "str", "sw",
+          "t", "th", "tr", "v", "w", "wh", "y", "z"]
+
+NUCLEI = ["a", "e", "i", "o", "u", "ai", "ea", "ee", "ie", "oa", "oo", "ou",
+          "y"]
+
+CODAS = ["", "", "b", "ck", "d", "ft", "g", "k", "l", "ll", "m", "n", "nd",
+         "ng", "nk", "nt", "p", "r", "rd", "rk", "s", "sh", "st", "t", "th",
+         "x"]
+
+FILLERS = ["the", "a", "to", "of", "and", "in", "is", "it", "that", "was",
+           "for", "on", "with", "as", "at", "by", "from", "this", "be", "or"]
+
+# (count, weight) fan-outs, roughly those of a learner's dictionary
+MEANING_FANOUT = [(1, 45), (2, 30), (3, 15), (4, 7), (5, 3)]
+
+SENTENCE_FANOUT = [(0, 10), (1, 25), (2, 30), (3, 25), (4, 10)]
+
+PERCENTILES = (50, 90, 95, 99)
+
+def generateWords(count: int, seed: int=0):
+    """ Yield `count` distinct word records for `insertWordDetail` """
+
+    generator = random.Random(seed)
+    meaningCounts, meaningWeights = zip(*MEANING_FANOUT)
+    sentenceCounts, sentenceWeights = zip(*SENTENCE_FANOUT)
+    seen = set()
+    vocabulary = []
+
+    def syllable() -> str:
+        return (generator.choice(ONSETS) + generator.choice(NUCLEI)
+                + generator.choice(CODAS))
+
+    def phrase(words: int) -> str:
+        tokens = []
+        for _ in range(words):
+            if vocabulary and generator.random() < 0.4:
+                tokens.append(generator.choice(vocabulary))
+            else:
+                tokens.append(generator.choice(FILLERS))
+        return " ".join(tokens)
+
+    while len(seen) < count:
+        text = "".join(syllable()
+                       for _ in range(generator.choice((1, 2, 2, 3, 3, 4))))
+        if text in seen:
+            continue
+        seen.add(text)
+        if len(vocabulary) < 5000:
+            vocabulary.append(text)
+
+        meanings = []
+        for _ in range(generator.choices(meaningCounts, meaningWeights)[0]):
+            sentences = []
+            for _ in range(generator.choices(sentenceCounts,
+                                             sentenceWeights)[0]):
+                sentence = phrase(generator.randint(6, 16))
+                sentences.append(sentence.capitalize() + f" {text}.")
+            meanings.append({
+                "text": phrase(generator.randint(4, 12)).capitalize() + ".",
+                "sentences": sentences,
+            })
+
+        yield {"text": text, "meanings": meanings}
+
+def misspell(word: str, generator: random.Random) -> str:
+    """ Apply one random substitution, insertion or deletion to `word` """
+
+    position = generator.randrange(len(word))
+    edit = generator.randrange(3)
+    if edit == 0:
+        return word[:position] + generator.choice(LETTERS) + word[position + 1:]
+    elif edit == 1:
+        return word[:position] + generator.choice(LETTERS) + word[position:]
+    elif len(word) > 1:
+        return word[:position] + word[position + 1:]
+    return word
+
+def summarize(latencies: list, elapsed: float | None=None) -> dict:
+    """ Summarize latencies in seconds as milliseconds with percentiles """
+
+    if not latencies:
+        return {"count": 0}
+
+    latencies = sorted(latencies)
+    count = len(latencies)
+
+    def percentile(p: int) -> float:
+        # Nearest rank
+        index = max(0, -(-p * count // 100) - 1)
+        return latencies[index] * 1000
+
+    summary = {
+        "count": count,
+        "mean": sum(latencies) / count * 1000,
+        "min": latencies[0] * 1000,
+        "max": latencies[-1] * 1000,
+    }
+    for p in PERCENTILES:
+        summary[f"p{p}"] = percentile(p)
+
+    if elapsed is not None:
+        summary["seconds"] = elapsed
+        summary["opsPerSecond"] = count / elapsed if elapsed else None
+
+    return summary
+
+def measure(operation, arguments: list) -> dict:
+    """ Call `operation` once per item of `arguments` and time every call """
+
+    latencies = []
+    startTime = time.perf_counter()
+    for argument in arguments:
+        callTime = time.perf_counter()
+        operation(argument)
+        latencies.append(time.perf_counter() - callTime)
+
+    return summarize(latencies, time.perf_counter() - startTime)
+
+def benchInsert(dbConn: database.Connection, count: int, seed: int) -> dict:
+    latencies = []
+
+    def onBatch(report: dict):
+        latencies.append(report["seconds"])
+
+    startTime = time.perf_counter()
+    reports = dbConn.insertWordDetail(generateWords(count, seed),
+                                      atomic=False, onBatch=onBatch)
+    elapsed = time.perf_counter() - startTime
+
+    records = sum(report["records"] for report in reports)
+    rows = sum(report["words"] + report["meanings"] + report["sentences"]
+               for report in reports)
+
+    return {
+        "batches": summarize(latencies),
+        "records": records,
+        "rows": rows,
+        "seconds": elapsed,
+        "recordsPerSecond": records / elapsed if elapsed else None,
+        "rowsPerSecond": rows / elapsed if elapsed else None,
+    }
+
+def loadWords(dbPath: str) -> list:
+    """ Read every (wordId, wordText) pair, in id order """
+
+    dbConn = sqlite3.connect(dbPath)
+    try:
+        return dbConn.execute(
+            "SELECT wordId, wordText FROM wordTable ORDER BY wordId;"
+        ).fetchall()
+    finally:
+        dbConn.close()
+
+def benchDatabase(dbPath: str, count: int, seed: int, samples: int) -> dict:
+    # No cache, so that every call reaches SQLite
+    dbConn = database.Connection(dbPath)
+    generator = random.Random(seed)
+
+    results = {"insertWordDetail": benchInsert(dbConn, count, seed)}
+
+    words = loadWords(dbPath)
+    picks = [generator.choice(words) for _ in range(samples)]
+    texts = [wordText for _, wordText in picks]
+    wordIds = [wordId for wordId, _ in picks]
+
+    results["searchWord.exact"] = measure(
+        lambda text: dbConn.searchWord(text), texts)
+    results["searchWord.fuzzy"] = measure(
+        lambda text: dbConn.searchWord(text[:3], fuzzy=True), texts)
+    results["searchSimilarWords"] = measure(
+        lambda text: dbConn.searchSimilarWords(misspell(text, generator)),
+        texts)
+    results["fetchWords"] = measure(
+        lambda sortByTime: dbConn.fetchWords(20, sortByTime),
+        [index % 2 == 0 for index in range(samples)])
+    results["fetchWordById"] = measure(dbConn.fetchWordById, wordIds)
+    results["fetchWordDetail"] = measure(dbConn.fetchWordDetail, wordIds)
+
+    # Deletes last, on distinct words, so the reads above see the full set
+    victims = generator.sample(words, min(samples, len(words)))
+    results["deleteWordById"] = measure(dbConn.deleteWordById,
+                                        [wordId for wordId, _ in victims])
+
+    return results
+
+def benchRoutes(dbPath: str, seed: int, threads: int, requests: int) -> dict:
+    from . import createApp
+
+    app = createApp(dbPath)
+    words = loadWords(dbPath)
+    generator = random.Random(seed)
+
+    workload = {
+        "GET /words": lambda: "/words?max=20",
+        "GET /words/<id>": lambda: f"/words/{generator.choice(words)[0]}",
+        "GET /words/details": lambda: "/words/details?ids=" + ",".join(
+            str(generator.choice(words)[0]) for _ in range(10)),
+        "GET /words/suggest": lambda: ("/words/suggest?prefix="
+                                       + generator.choice(words)[1][:2]),
+        "GET /words/similar": lambda: ("/words/similar?word="
+                                       + misspell(generator.choice(words)[1],
+                                                  generator)),
+        "GET /words/random": lambda: "/words/random?n=10",
+        "GET /search": lambda: "/search?q=" + generator.choice(words)[1],
+        "GET /stats": lambda: "/stats",
+        "GET /review/next": lambda: "/review/next?n=20",
+    }
+
+    # Draw all URLs up front so the sequence does not depend on scheduling
+    jobs = []
+    for _ in range(requests):
+        name = generator.choice(list(workload))
+        jobs.append((name, workload[name]()))
+
+    local = threading.local()
+    latencies = {name: [] for name in workload}
+    errors = {name: 0 for name in workload}
+    lock = threading.Lock()
+
+    def request(job: tuple):
+        name, url = job
+        if not hasattr(local, "client"):
+            local.client = app.test_client()
+
+        callTime = time.perf_counter()
+        response = local.client.get(url)
+        latency = time.perf_counter() - callTime
+
+        with lock:
+            latencies[name].append(latency)
+            if response.status_code >= 400:
+                errors[name] += 1
+
+    startTime = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(threads) as executor:
+        list(executor.map(request, jobs))
+    elapsed = time.perf_counter() - startTime
+
+    results = {}
+    for name in workload:
+        results[name] = dict(summarize(latencies[name]), errors=errors[name])
+    results["total"] = summarize(
+        [latency for values in latencies.values() for latency in values],
+        elapsed)
+    results["threads"] = threads
+
+    return results
+
+def main(argv: list | None=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m flashcard.benchmark",
+        description="Benchmark the database layer and routes on generated "
+                    "data")
+    parser.add_argument("dbPath")
+    parser.add_argument("--words", type=int, default=10000,
+                        help="number of words to generate")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--samples", type=int, default=1000,
+                        help="calls per database operation")
+    parser.add_argument("--threads", type=int, default=8,
+                        help="concurrent clients for the route benchmark")
+    parser.add_argument("--requests", type=int, default=5000,
+                        help="total requests for the route benchmark")
+    parser.add_argument("--skip-routes", action="store_true",
+                        help="only benchmark the database layer")
+    parser.add_argument("--output", default=None,
+                        help="write the JSON results here instead of stdout")
+    args = parser.parse_args(argv)
+
+    if os.path.exists(args.dbPath):
+        parser.error(f"{args.dbPath} already exists")
+
+    results = {
+        "parameters": {
+            "words": args.words,
+            "seed": args.seed,
+            "samples": args.samples,
+            "threads": args.threads,
+            "requests": args.requests,
+        },
+        "environment": {
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+        },
+        "database": benchDatabase(args.dbPath, args.words, args.seed,
+                                  args.samples),
+    }
+
+    if not args.skip_routes:
+        results["routes"] = benchRoutes(args.dbPath, args.seed, args.threads,
+                                        args.requests)
+
+    output = json.dumps(results, indent=2)
+    if args.output is None:
+        print(output)
+    else:
+        with open(args.output, "w") as outputFile:
+            outputFile.write(output + "\n")
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
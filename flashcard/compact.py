@@ -0,0 +1,32 @@
+""" Remove orphaned rows from a flashcard database and reclaim space
+
+Usage:
+
+    python -m flashcard.compact DB_PATH
+
+Meanings whose word and sentences whose meaning no longer exist are deleted,
+then the database file is vacuumed. Run it once on databases written before
+deletes cascaded; the tool takes the write lock for the duration.
+"""
+
+from . import database
+import argparse
+import sys
+
+def main(argv: list | None=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m flashcard.compact",
+        description="Remove orphaned rows and reclaim space")
+    parser.add_argument("dbPath")
+    args = parser.parse_args(argv)
+
+    dbConn = database.Connection(args.dbPath)
+    report = dbConn.compact()
+
+    print(f"removed {report['orphanMeanings']} orphaned meanings and "
+          f"{report['orphanSentences']} orphaned sentences, "
+          f"reclaimed {report['reclaimedPages']} pages", file=sys.stderr)
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
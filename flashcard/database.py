@@ -1,7 +1,19 @@
+import collections
+import concurrent.futures
 import datetime
+import functools
+import itertools
+import base64
+import json
+import logging
 import sqlite3
+import queue
+import random
+import threading
+import time
 import re
 import os
+import pathlib
 
 SQL_CREATE_WORD_TABLE = """
     CREATE TABLE IF NOT EXISTS wordTable (
@@ -94,133 +106,2626 @@ SQL_CREATE_SENTENCE_TABLE = """
     );
     """
 
+SQL_CREATE_WORD_CREATION_TIME_INDEX = """
+    CREATE INDEX IF NOT EXISTS idxWordCreationTime
+        ON wordTable (creationTime);
+    """
+
+SQL_CREATE_WORD_MODIFICATION_TIME_INDEX = """
+    CREATE INDEX IF NOT EXISTS idxWordModificationTime
+        ON wordTable (modificationTime);
+    """
+
+SQL_CREATE_WORD_ACCESS_TIME_INDEX = """
+    CREATE INDEX IF NOT EXISTS idxWordAccessTime
+        ON wordTable (accessTime);
+    """
+
+SQL_CREATE_MEANING_WORD_ID_INDEX = """
+    CREATE INDEX IF NOT EXISTS idxMeaningWordId
+        ON meaningTable (wordId);
+    """
+
+SQL_CREATE_SENTENCE_MEANING_ID_INDEX = """
+    CREATE INDEX IF NOT EXISTS idxSentenceMeaningId
+        ON sentenceTable (meaningId);
+    """
+
+SQL_CREATE_WORD_TEXT_LOWER_INDEX = """
+    CREATE INDEX IF NOT EXISTS idxWordTextLower
+        ON wordTable (lower(wordText));
+    """
+
+SQL_CREATE_WORD_TRIGRAM_TABLE = """
+    CREATE VIRTUAL TABLE IF NOT EXISTS wordTrigramTable
+        USING fts5 (wordText,
+                    content = 'wordTable', content_rowid = 'wordId',
+                    tokenize = 'trigram');
+    """
+
+SQL_CREATE_WORD_TRIGRAM_TRIGGERS = """
+    CREATE TRIGGER IF NOT EXISTS trgWordTrigramInsert
+        AFTER INSERT ON wordTable
+    BEGIN
+        INSERT INTO wordTrigramTable (rowid, wordText)
+            VALUES (new.wordId, new.wordText);
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trgWordTrigramDelete
+        AFTER DELETE ON wordTable
+    BEGIN
+        INSERT INTO wordTrigramTable (wordTrigramTable, rowid, wordText)
+            VALUES ('delete', old.wordId, old.wordText);
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trgWordTrigramUpdate
+        AFTER UPDATE OF wordText ON wordTable
+    BEGIN
+        INSERT INTO wordTrigramTable (wordTrigramTable, rowid, wordText)
+            VALUES ('delete', old.wordId, old.wordText);
+        INSERT INTO wordTrigramTable (rowid, wordText)
+            VALUES (new.wordId, new.wordText);
+    END;
+    """
+
+SQL_CREATE_MEANING_SEARCH_TABLE = """
+    CREATE VIRTUAL TABLE IF NOT EXISTS meaningSearchTable
+        USING fts5 (meaningText,
+                    content = 'meaningTable', content_rowid = 'meaningId',
+                    tokenize = 'porter unicode61');
+    """
+
+SQL_CREATE_MEANING_SEARCH_TRIGGERS = """
+    CREATE TRIGGER IF NOT EXISTS trgMeaningSearchInsert
+        AFTER INSERT ON meaningTable
+    BEGIN
+        INSERT INTO meaningSearchTable (rowid, meaningText)
+            VALUES (new.meaningId, new.meaningText);
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trgMeaningSearchDelete
+        AFTER DELETE ON meaningTable
+    BEGIN
+        INSERT INTO meaningSearchTable (meaningSearchTable, rowid, meaningText)
+            VALUES ('delete', old.meaningId, old.meaningText);
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trgMeaningSearchUpdate
+        AFTER UPDATE OF meaningText ON meaningTable
+    BEGIN
+        INSERT INTO meaningSearchTable (meaningSearchTable, rowid, meaningText)
+            VALUES ('delete', old.meaningId, old.meaningText);
+        INSERT INTO meaningSearchTable (rowid, meaningText)
+            VALUES (new.meaningId, new.meaningText);
+    END;
+    """
+
+SQL_CREATE_SENTENCE_SEARCH_TABLE = """
+    CREATE VIRTUAL TABLE IF NOT EXISTS sentenceSearchTable
+        USING fts5 (sentenceText,
+                    content = 'sentenceTable', content_rowid = 'sentenceId',
+                    tokenize = 'porter unicode61');
+    """
+
+SQL_CREATE_SENTENCE_SEARCH_TRIGGERS = """
+    CREATE TRIGGER IF NOT EXISTS trgSentenceSearchInsert
+        AFTER INSERT ON sentenceTable
+    BEGIN
+        INSERT INTO sentenceSearchTable (rowid, sentenceText)
+            VALUES (new.sentenceId, new.sentenceText);
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trgSentenceSearchDelete
+        AFTER DELETE ON sentenceTable
+    BEGIN
+        INSERT INTO sentenceSearchTable (sentenceSearchTable, rowid,
+                                         sentenceText)
+            VALUES ('delete', old.sentenceId, old.sentenceText);
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trgSentenceSearchUpdate
+        AFTER UPDATE OF sentenceText ON sentenceTable
+    BEGIN
+        INSERT INTO sentenceSearchTable (sentenceSearchTable, rowid,
+                                         sentenceText)
+            VALUES ('delete', old.sentenceId, old.sentenceText);
+        INSERT INTO sentenceSearchTable (rowid, sentenceText)
+            VALUES (new.sentenceId, new.sentenceText);
+    END;
+    """
+
+SQL_REBUILD_SEARCH_TABLE = """
+    INSERT INTO {table} ({table}) VALUES ('rebuild');
+    """
+
+SQL_CREATE_CHANGE_TABLE = """
+    CREATE TABLE IF NOT EXISTS changeTable (
+        changeId INTEGER
+            CONSTRAINT pkChangeId
+                PRIMARY KEY
+            CONSTRAINT ckChangeId
+                CHECK (changeId = 1),
+
+        changeCount INTEGER
+            CONSTRAINT nnChangeCount
+                NOT NULL,
+
+        changeTime INTEGER
+            CONSTRAINT nnChangeTime
+                NOT NULL,
+
+        accessCount INTEGER
+            CONSTRAINT nnAccessCount
+                NOT NULL,
+
+        accessTime INTEGER
+            CONSTRAINT nnAccessTime
+                NOT NULL
+    );
+
+    INSERT OR IGNORE INTO
+        changeTable (changeId, changeCount, changeTime, accessCount,
+                     accessTime)
+        VALUES (1, 0, CAST(strftime('%s', 'now') AS INTEGER), 0, 0);
+    """
+
+SQL_CREATE_CHANGE_TRIGGERS = """
+    CREATE TRIGGER IF NOT EXISTS trgChangeWordInsert
+        AFTER INSERT ON wordTable
+    BEGIN
+        UPDATE changeTable
+            SET changeCount = changeCount + 1,
+                changeTime = CAST(strftime('%s', 'now') AS INTEGER);
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trgChangeWordUpdate
+        AFTER UPDATE OF wordText, modificationTime ON wordTable
+    BEGIN
+        UPDATE changeTable
+            SET changeCount = changeCount + 1,
+                changeTime = CAST(strftime('%s', 'now') AS INTEGER);
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trgChangeWordDelete
+        AFTER DELETE ON wordTable
+    BEGIN
+        UPDATE changeTable
+            SET changeCount = changeCount + 1,
+                changeTime = CAST(strftime('%s', 'now') AS INTEGER);
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trgChangeMeaningInsert
+        AFTER INSERT ON meaningTable
+    BEGIN
+        UPDATE wordTable
+            SET modificationTime = new.modificationTime
+            WHERE wordId = new.wordId
+              AND modificationTime < new.modificationTime;
+        UPDATE changeTable
+            SET changeCount = changeCount + 1,
+                changeTime = CAST(strftime('%s', 'now') AS INTEGER);
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trgChangeMeaningUpdate
+        AFTER UPDATE OF meaningText, modificationTime ON meaningTable
+    BEGIN
+        UPDATE wordTable
+            SET modificationTime = new.modificationTime
+            WHERE wordId = new.wordId
+              AND modificationTime < new.modificationTime;
+        UPDATE changeTable
+            SET changeCount = changeCount + 1,
+                changeTime = CAST(strftime('%s', 'now') AS INTEGER);
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trgChangeMeaningDelete
+        AFTER DELETE ON meaningTable
+    BEGIN
+        UPDATE wordTable
+            SET modificationTime = CAST(strftime('%s', 'now') AS INTEGER)
+            WHERE wordId = old.wordId
+              AND modificationTime < CAST(strftime('%s', 'now') AS INTEGER);
+        UPDATE changeTable
+            SET changeCount = changeCount + 1,
+                changeTime = CAST(strftime('%s', 'now') AS INTEGER);
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trgChangeSentenceInsert
+        AFTER INSERT ON sentenceTable
+    BEGIN
+        UPDATE wordTable
+            SET modificationTime = new.modificationTime
+            WHERE wordId = (SELECT wordId FROM meaningTable
+                                WHERE meaningId = new.meaningId)
+              AND modificationTime < new.modificationTime;
+        UPDATE changeTable
+            SET changeCount = changeCount + 1,
+                changeTime = CAST(strftime('%s', 'now') AS INTEGER);
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trgChangeSentenceUpdate
+        AFTER UPDATE OF sentenceText, modificationTime ON sentenceTable
+    BEGIN
+        UPDATE wordTable
+            SET modificationTime = new.modificationTime
+            WHERE wordId = (SELECT wordId FROM meaningTable
+                                WHERE meaningId = new.meaningId)
+              AND modificationTime < new.modificationTime;
+        UPDATE changeTable
+            SET changeCount = changeCount + 1,
+                changeTime = CAST(strftime('%s', 'now') AS INTEGER);
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trgChangeSentenceDelete
+        AFTER DELETE ON sentenceTable
+    BEGIN
+        UPDATE wordTable
+            SET modificationTime = CAST(strftime('%s', 'now') AS INTEGER)
+            WHERE wordId = (SELECT wordId FROM meaningTable
+                                WHERE meaningId = old.meaningId)
+              AND modificationTime < CAST(strftime('%s', 'now') AS INTEGER);
+        UPDATE changeTable
+            SET changeCount = changeCount + 1,
+                changeTime = CAST(strftime('%s', 'now') AS INTEGER);
+    END;
+    """
+
+SQL_CREATE_CASCADE_TRIGGERS = """
+    CREATE TRIGGER IF NOT EXISTS trgCascadeWordDelete
+        AFTER DELETE ON wordTable
+    BEGIN
+        DELETE FROM meaningTable WHERE wordId = old.wordId;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trgCascadeMeaningDelete
+        AFTER DELETE ON meaningTable
+    BEGIN
+        DELETE FROM sentenceTable WHERE meaningId = old.meaningId;
+    END;
+    """
+
+SQL_DELETE_ORPHAN_MEANINGS = """
+    DELETE FROM meaningTable
+        WHERE NOT EXISTS (SELECT 1 FROM wordTable
+                              WHERE wordTable.wordId = meaningTable.wordId);
+    """
+
+SQL_DELETE_ORPHAN_SENTENCES = """
+    DELETE FROM sentenceTable
+        WHERE NOT EXISTS (SELECT 1 FROM meaningTable
+                              WHERE meaningTable.meaningId
+                                  = sentenceTable.meaningId);
+    """
+
+SQL_COUNT_SENTENCES = """
+    SELECT count(*) FROM sentenceTable;
+    """
+
+SQL_OPTIMIZE_SEARCH_TABLE = """
+    INSERT INTO {table} ({table}) VALUES ('optimize');
+    """
+
+# Every change to a row stamps it with the change counter, which only grows
+# and is bumped under the write lock, so stamps follow commit order. The
+# triggers bump the counter themselves, whatever order they fire in.
+CHANGE_SEQUENCE_TABLES = ("wordTable", "meaningTable", "sentenceTable",
+                          "tombstoneTable")
+
+SQL_ADD_CHANGE_SEQUENCE_COLUMN = """
+    ALTER TABLE {table} ADD COLUMN changeSeq INTEGER NOT NULL DEFAULT 0;
+    """
+
+SQL_CREATE_CHANGE_SEQUENCE = """
+    CREATE INDEX IF NOT EXISTS idxWordChangeSeq
+        ON wordTable (changeSeq);
+
+    CREATE INDEX IF NOT EXISTS idxMeaningChangeSeq
+        ON meaningTable (changeSeq);
+
+    CREATE INDEX IF NOT EXISTS idxSentenceChangeSeq
+        ON sentenceTable (changeSeq);
+
+    CREATE INDEX IF NOT EXISTS idxTombstoneChangeSeq
+        ON tombstoneTable (changeSeq);
+    """
+
+SQL_CREATE_CHANGE_SEQUENCE_TRIGGERS = """
+    CREATE TRIGGER IF NOT EXISTS trgSeqWordInsert
+        AFTER INSERT ON wordTable
+    BEGIN
+        UPDATE changeTable
+            SET changeCount = changeCount + 1;
+        UPDATE wordTable
+            SET changeSeq = (SELECT changeCount FROM changeTable)
+            WHERE wordId = new.wordId;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trgSeqWordUpdate
+        AFTER UPDATE OF wordText, modificationTime ON wordTable
+    BEGIN
+        UPDATE changeTable
+            SET changeCount = changeCount + 1;
+        UPDATE wordTable
+            SET changeSeq = (SELECT changeCount FROM changeTable)
+            WHERE wordId = new.wordId;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trgSeqMeaningInsert
+        AFTER INSERT ON meaningTable
+    BEGIN
+        UPDATE changeTable
+            SET changeCount = changeCount + 1;
+        UPDATE meaningTable
+            SET changeSeq = (SELECT changeCount FROM changeTable)
+            WHERE meaningId = new.meaningId;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trgSeqMeaningUpdate
+        AFTER UPDATE OF meaningText, modificationTime ON meaningTable
+    BEGIN
+        UPDATE changeTable
+            SET changeCount = changeCount + 1;
+        UPDATE meaningTable
+            SET changeSeq = (SELECT changeCount FROM changeTable)
+            WHERE meaningId = new.meaningId;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trgSeqSentenceInsert
+        AFTER INSERT ON sentenceTable
+    BEGIN
+        UPDATE changeTable
+            SET changeCount = changeCount + 1;
+        UPDATE sentenceTable
+            SET changeSeq = (SELECT changeCount FROM changeTable)
+            WHERE sentenceId = new.sentenceId;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trgSeqSentenceUpdate
+        AFTER UPDATE OF sentenceText, modificationTime ON sentenceTable
+    BEGIN
+        UPDATE changeTable
+            SET changeCount = changeCount + 1;
+        UPDATE sentenceTable
+            SET changeSeq = (SELECT changeCount FROM changeTable)
+            WHERE sentenceId = new.sentenceId;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trgSeqTombstoneInsert
+        AFTER INSERT ON tombstoneTable
+    BEGIN
+        UPDATE changeTable
+            SET changeCount = changeCount + 1;
+        UPDATE tombstoneTable
+            SET changeSeq = (SELECT changeCount FROM changeTable)
+            WHERE tombstoneId = new.tombstoneId;
+    END;
+    """
+
+SQL_CREATE_TOMBSTONE_TABLE = """
+    CREATE TABLE IF NOT EXISTS tombstoneTable (
+        tombstoneId INTEGER
+            CONSTRAINT pkTombstoneId
+                PRIMARY KEY
+                AUTOINCREMENT,
+
+        entityType TEXT
+            CONSTRAINT nnEntityType
+                NOT NULL,
+
+        entityId INTEGER
+            CONSTRAINT nnEntityId
+                NOT NULL,
+
+        deletionTime INTEGER
+            CONSTRAINT nnDeletionTime
+                NOT NULL
+    );
+
+    CREATE INDEX IF NOT EXISTS idxTombstoneDeletionTime
+        ON tombstoneTable (deletionTime);
+
+    CREATE INDEX IF NOT EXISTS idxMeaningModificationTime
+        ON meaningTable (modificationTime);
+
+    CREATE INDEX IF NOT EXISTS idxSentenceModificationTime
+        ON sentenceTable (modificationTime);
+    """
+
+SQL_CREATE_TOMBSTONE_TRIGGERS = """
+    CREATE TRIGGER IF NOT EXISTS trgTombstoneWord
+        AFTER DELETE ON wordTable
+    BEGIN
+        INSERT INTO tombstoneTable (entityType, entityId, deletionTime)
+            VALUES ('word', old.wordId,
+                    CAST(strftime('%s', 'now') AS INTEGER));
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trgTombstoneMeaning
+        AFTER DELETE ON meaningTable
+    BEGIN
+        INSERT INTO tombstoneTable (entityType, entityId, deletionTime)
+            VALUES ('meaning', old.meaningId,
+                    CAST(strftime('%s', 'now') AS INTEGER));
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trgTombstoneSentence
+        AFTER DELETE ON sentenceTable
+    BEGIN
+        INSERT INTO tombstoneTable (entityType, entityId, deletionTime)
+            VALUES ('sentence', old.sentenceId,
+                    CAST(strftime('%s', 'now') AS INTEGER));
+    END;
+    """
+
+# The review log is history, so its wordId is no foreign key: it outlives
+# the word, whose id is never reused and whose deletion is tombstoned
+SQL_CREATE_REVIEW_TABLES = """
+    CREATE TABLE IF NOT EXISTS reviewStateTable (
+        wordId INTEGER
+            CONSTRAINT pkReviewWordId
+                PRIMARY KEY
+            CONSTRAINT fkReviewWordId
+                REFERENCES wordTable (wordId),
+
+        repetitions INTEGER
+            CONSTRAINT nnRepetitions
+                NOT NULL,
+
+        lapses INTEGER
+            CONSTRAINT nnLapses
+                NOT NULL,
+
+        interval REAL
+            CONSTRAINT nnInterval
+                NOT NULL,
+
+        ease REAL
+            CONSTRAINT nnEase
+                NOT NULL,
+
+        dueTime INTEGER
+            CONSTRAINT nnDueTime
+                NOT NULL,
+
+        reviewTime INTEGER
+    );
+
+    CREATE INDEX IF NOT EXISTS idxReviewDueTime
+        ON reviewStateTable (dueTime);
+
+    CREATE TABLE IF NOT EXISTS reviewLogTable (
+        reviewId INTEGER
+            CONSTRAINT pkReviewId
+                PRIMARY KEY
+                AUTOINCREMENT,
+
+        wordId INTEGER
+            CONSTRAINT nnReviewLogWordId
+                NOT NULL,
+
+        grade INTEGER
+            CONSTRAINT nnGrade
+                NOT NULL,
+
+        interval REAL
+            CONSTRAINT nnInterval
+                NOT NULL,
+
+        ease REAL
+            CONSTRAINT nnEase
+                NOT NULL,
+
+        reviewTime INTEGER
+            CONSTRAINT nnReviewTime
+                NOT NULL
+    );
+
+    CREATE INDEX IF NOT EXISTS idxReviewLogWordId
+        ON reviewLogTable (wordId);
+
+    INSERT OR IGNORE INTO
+        reviewStateTable (wordId, repetitions, lapses, interval, ease,
+                          dueTime)
+        SELECT wordId, 0, 0, 0.0, 2.5, creationTime
+            FROM wordTable;
+    """
+
+SQL_CREATE_REVIEW_TRIGGERS = """
+    CREATE TRIGGER IF NOT EXISTS trgReviewWordInsert
+        AFTER INSERT ON wordTable
+    BEGIN
+        INSERT INTO
+            reviewStateTable (wordId, repetitions, lapses, interval, ease,
+                              dueTime)
+            VALUES (new.wordId, 0, 0, 0.0, 2.5, new.creationTime);
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trgReviewWordDelete
+        AFTER DELETE ON wordTable
+    BEGIN
+        DELETE FROM reviewStateTable WHERE wordId = old.wordId;
+    END;
+    """
+
+SQL_FETCH_DUE_CARDS = """
+    SELECT reviewStateTable.wordId, wordTable.wordText,
+           reviewStateTable.repetitions, reviewStateTable.lapses,
+           reviewStateTable.interval, reviewStateTable.ease,
+           reviewStateTable.dueTime, reviewStateTable.reviewTime
+        FROM reviewStateTable
+        JOIN wordTable ON wordTable.wordId = reviewStateTable.wordId
+        WHERE reviewStateTable.dueTime <= ?
+        ORDER BY reviewStateTable.dueTime
+        LIMIT ?;
+    """
+
+SQL_FETCH_REVIEW_STATE = """
+    SELECT repetitions, lapses, interval, ease
+        FROM reviewStateTable
+        WHERE wordId = ?;
+    """
+
+SQL_UPDATE_REVIEW_STATE = """
+    UPDATE reviewStateTable
+        SET repetitions = ?, lapses = ?, interval = ?, ease = ?,
+            dueTime = ?, reviewTime = ?
+        WHERE wordId = ?;
+    """
+
+SQL_INSERT_REVIEW_LOG = """
+    INSERT INTO
+        reviewLogTable (wordId, grade, interval, ease, reviewTime)
+        VALUES (?, ?, ?, ?, ?);
+    """
+
+SQL_CREATE_STATS_TABLE = """
+    CREATE TABLE IF NOT EXISTS statsTable (
+        statsId INTEGER
+            CONSTRAINT pkStatsId
+                PRIMARY KEY
+            CONSTRAINT ckStatsId
+                CHECK (statsId = 1),
+
+        wordCount INTEGER
+            CONSTRAINT nnWordCount
+                NOT NULL,
+
+        meaningCount INTEGER
+            CONSTRAINT nnMeaningCount
+                NOT NULL,
+
+        sentenceCount INTEGER
+            CONSTRAINT nnSentenceCount
+                NOT NULL
+    );
+
+    CREATE TABLE IF NOT EXISTS statsDayTable (
+        day INTEGER
+            CONSTRAINT pkDay
+                PRIMARY KEY,
+
+        wordCount INTEGER
+            CONSTRAINT nnWordCount
+                NOT NULL,
+
+        meaningCount INTEGER
+            CONSTRAINT nnMeaningCount
+                NOT NULL,
+
+        sentenceCount INTEGER
+            CONSTRAINT nnSentenceCount
+                NOT NULL
+    );
+
+    INSERT OR IGNORE INTO
+        statsTable (statsId, wordCount, meaningCount, sentenceCount)
+        VALUES (1,
+                (SELECT count(*) FROM wordTable),
+                (SELECT count(*) FROM meaningTable),
+                (SELECT count(*) FROM sentenceTable));
+
+    INSERT OR IGNORE INTO
+        statsDayTable (day, wordCount, meaningCount, sentenceCount)
+        SELECT day, sum(wordCount), sum(meaningCount), sum(sentenceCount)
+            FROM (SELECT creationTime / 86400 AS day,
+                         1 AS wordCount, 0 AS meaningCount,
+                         0 AS sentenceCount
+                      FROM wordTable
+                  UNION ALL
+                  SELECT creationTime / 86400, 0, 1, 0
+                      FROM meaningTable
+                  UNION ALL
+                  SELECT creationTime / 86400, 0, 0, 1
+                      FROM sentenceTable)
+            GROUP BY day;
+    """
+
+# The days count what was added on them, so deletes only lower the totals
+SQL_CREATE_STATS_TRIGGERS = """
+    CREATE TRIGGER IF NOT EXISTS trgStatsWordInsert
+        AFTER INSERT ON wordTable
+    BEGIN
+        UPDATE statsTable SET wordCount = wordCount + 1;
+        INSERT INTO
+            statsDayTable (day, wordCount, meaningCount, sentenceCount)
+            VALUES (new.creationTime / 86400, 1, 0, 0)
+            ON CONFLICT (day) DO UPDATE SET wordCount = wordCount + 1;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trgStatsWordDelete
+        AFTER DELETE ON wordTable
+    BEGIN
+        UPDATE statsTable SET wordCount = wordCount - 1;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trgStatsMeaningInsert
+        AFTER INSERT ON meaningTable
+    BEGIN
+        UPDATE statsTable SET meaningCount = meaningCount + 1;
+        INSERT INTO
+            statsDayTable (day, wordCount, meaningCount, sentenceCount)
+            VALUES (new.creationTime / 86400, 0, 1, 0)
+            ON CONFLICT (day) DO UPDATE SET meaningCount = meaningCount + 1;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trgStatsMeaningDelete
+        AFTER DELETE ON meaningTable
+    BEGIN
+        UPDATE statsTable SET meaningCount = meaningCount - 1;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trgStatsSentenceInsert
+        AFTER INSERT ON sentenceTable
+    BEGIN
+        UPDATE statsTable SET sentenceCount = sentenceCount + 1;
+        INSERT INTO
+            statsDayTable (day, wordCount, meaningCount, sentenceCount)
+            VALUES (new.creationTime / 86400, 0, 0, 1)
+            ON CONFLICT (day) DO UPDATE SET sentenceCount = sentenceCount + 1;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trgStatsSentenceDelete
+        AFTER DELETE ON sentenceTable
+    BEGIN
+        UPDATE statsTable SET sentenceCount = sentenceCount - 1;
+    END;
+    """
+
+SQL_FETCH_STATS = """
+    SELECT wordCount, meaningCount, sentenceCount, changeCount, changeTime
+        FROM statsTable, changeTable;
+    """
+
+SQL_FETCH_STATS_DAYS = """
+    SELECT day, wordCount, meaningCount, sentenceCount
+        FROM statsDayTable
+        WHERE day >= ?
+        ORDER BY day;
+    """
+
+SQL_SYNC_WORDS = """
+    SELECT changeSeq, wordId,
+           wordId, wordText, creationTime, modificationTime
+        FROM wordTable
+        WHERE (changeSeq, wordId) > (?, ?)
+          AND changeSeq <= ?
+        ORDER BY changeSeq, wordId
+        LIMIT ?;
+    """
+
+SQL_SYNC_MEANINGS = """
+    SELECT changeSeq, meaningId,
+           meaningId, wordId, meaningText, creationTime, modificationTime
+        FROM meaningTable
+        WHERE (changeSeq, meaningId) > (?, ?)
+          AND changeSeq <= ?
+        ORDER BY changeSeq, meaningId
+        LIMIT ?;
+    """
+
+SQL_SYNC_SENTENCES = """
+    SELECT changeSeq, sentenceId,
+           sentenceId, meaningId, sentenceText, creationTime, modificationTime
+        FROM sentenceTable
+        WHERE (changeSeq, sentenceId) > (?, ?)
+          AND changeSeq <= ?
+        ORDER BY changeSeq, sentenceId
+        LIMIT ?;
+    """
+
+SQL_SYNC_TOMBSTONES = """
+    SELECT changeSeq, tombstoneId,
+           entityType, entityId, deletionTime
+        FROM tombstoneTable
+        WHERE (changeSeq, tombstoneId) > (?, ?)
+          AND changeSeq <= ?
+        ORDER BY changeSeq, tombstoneId
+        LIMIT ?;
+    """
+
+SQL_FETCH_CHANGE_STATE = """
+    SELECT changeCount, changeTime,
+           (SELECT modificationTime FROM wordTable WHERE wordId = ?),
+           accessCount, accessTime
+        FROM changeTable;
+    """
+
+SQL_COUNT_ACCESS_FLUSH = """
+    UPDATE changeTable
+        SET accessCount = accessCount + 1,
+            accessTime = CAST(strftime('%s', 'now') AS INTEGER);
+    """
+
 SQL_INSERT_WORD = """
     INSERT INTO
         wordTable (wordText,
                    creationTime, modificationTime, accessTime)
-        VALUES (?, ?, ?, ?);
+        VALUES (?, ?, ?, ?)
+        RETURNING wordId;
+    """
+
+SQL_INSERT_MEANING = """
+    INSERT INTO
+        meaningTable (wordId, meaningText,
+                      creationTime, modificationTime, accessTime)
+        VALUES (?, ?, ?, ?, ?);
+    """
+
+SQL_INSERT_SENTENCE = """
+    INSERT INTO
+        sentenceTable (meaningId, sentenceText,
+                       creationTime, modificationTime, accessTime)
+        VALUES (?, ?, ?, ?, ?);
+    """
+
+SQL_QUERY_WORD_ID = """
+    SELECT wordId FROM wordTable WHERE wordText = ?;
+    """
+
+SQL_QUERY_MEANING_ID = """
+    SELECT meaningId FROM meaningTable WHERE wordId = ? AND meaningText = ?;
+    """
+
+SQL_QUERY_SENTENCE_ID = """
+    SELECT sentenceId
+        FROM sentenceTable
+        WHERE meaningId = ? AND sentenceText = ?;
+    """
+
+SQL_CREATE_STAGE_WORD_TABLE = """
+    CREATE TEMP TABLE IF NOT EXISTS stageWordTable (
+        wordText TEXT NOT NULL PRIMARY KEY
+    ) WITHOUT ROWID;
+    """
+
+SQL_CREATE_STAGE_MEANING_TABLE = """
+    CREATE TEMP TABLE IF NOT EXISTS stageMeaningTable (
+        wordText TEXT NOT NULL,
+        meaningText TEXT NOT NULL,
+        PRIMARY KEY (wordText, meaningText)
+    ) WITHOUT ROWID;
+    """
+
+SQL_CLEAR_STAGE_WORD_TABLE = """
+    DELETE FROM temp.stageWordTable;
+    """
+
+SQL_CLEAR_STAGE_MEANING_TABLE = """
+    DELETE FROM temp.stageMeaningTable;
+    """
+
+SQL_STAGE_WORD = """
+    INSERT INTO temp.stageWordTable (wordText) VALUES (?)
+        ON CONFLICT DO NOTHING;
+    """
+
+SQL_STAGE_MEANING = """
+    INSERT INTO
+        temp.stageMeaningTable (wordText, meaningText)
+        VALUES (?, ?)
+        ON CONFLICT DO NOTHING;
+    """
+
+SQL_BULK_INSERT_WORD = """
+    INSERT INTO
+        wordTable (wordText,
+                   creationTime, modificationTime, accessTime)
+        SELECT wordText, ?, ?, ?
+            FROM temp.stageWordTable
+            WHERE true
+        ON CONFLICT (wordText) DO NOTHING;
+    """
+
+SQL_BULK_INSERT_MEANING = """
+    INSERT INTO
+        meaningTable (wordId, meaningText,
+                      creationTime, modificationTime, accessTime)
+        SELECT w.wordId, s.meaningText, ?, ?, ?
+            FROM temp.stageMeaningTable AS s
+            JOIN wordTable AS w ON w.wordText = s.wordText
+            WHERE true
+        ON CONFLICT (wordId, meaningText) DO NOTHING;
+    """
+
+SQL_BULK_RESOLVE_MEANING_ID = """
+    SELECT s.wordText, s.meaningText, m.meaningId
+        FROM temp.stageMeaningTable AS s
+        JOIN wordTable AS w ON w.wordText = s.wordText
+        JOIN meaningTable AS m
+            ON m.wordId = w.wordId AND m.meaningText = s.meaningText;
+    """
+
+SQL_BULK_INSERT_SENTENCE = """
+    INSERT INTO
+        sentenceTable (meaningId, sentenceText,
+                       creationTime, modificationTime, accessTime)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (meaningId, sentenceText) DO NOTHING;
+    """
+
+SQL_SEARCH_WORD = """
+    SELECT wordId, wordText
+        FROM wordTable
+        WHERE wordText = ?
+        LIMIT ?;
+    """
+
+SQL_FUZZY_SEARCH_WORD = """
+    SELECT wordId, wordText
+        FROM wordTable
+        WHERE lower(wordText) >= ? AND lower(wordText) < ?
+        ORDER BY lower(wordText) {direction}, wordId {direction}
+        LIMIT ?;
+    """
+
+SQL_FUZZY_SEARCH_WORD_BY_TIME = """
+    SELECT wordId, wordText
+        FROM wordTable
+        WHERE lower(wordText) >= ? AND lower(wordText) < ?
+        ORDER BY {order}
+        LIMIT ?;
+    """
+
+SQL_SUGGEST_WORD = """
+    SELECT wordId, wordText
+        FROM wordTable
+        WHERE lower(wordText) >= ? AND lower(wordText) < ?
+        ORDER BY lower(wordText)
+        LIMIT ?;
+    """
+
+SQL_SIMILAR_WORD_CANDIDATES = """
+    SELECT wordTable.wordId, wordTable.wordText
+        FROM wordTrigramTable
+        JOIN wordTable ON wordTable.wordId = wordTrigramTable.rowid
+        WHERE wordTrigramTable MATCH ?
+          AND length(wordTable.wordText) BETWEEN ? AND ?
+        LIMIT ?;
+    """
+
+SQL_SIMILAR_SHORT_WORD_CANDIDATES = """
+    SELECT wordId, wordText
+        FROM wordTable
+        WHERE lower(wordText) >= ? AND lower(wordText) < ?
+          AND length(wordText) BETWEEN ? AND ?
+        LIMIT ?;
+    """
+
+SQL_SEARCH_TEXT = """
+    SELECT 'meaning', meaningTable.wordId, wordTable.wordText,
+           meaningTable.meaningId, NULL,
+           snippet(meaningSearchTable, 0, ?, ?, '...', ?),
+           bm25(meaningSearchTable) AS score
+        FROM meaningSearchTable
+        JOIN meaningTable
+            ON meaningTable.meaningId = meaningSearchTable.rowid
+        JOIN wordTable
+            ON wordTable.wordId = meaningTable.wordId
+        WHERE meaningSearchTable MATCH ?
+    UNION ALL
+    SELECT 'sentence', meaningTable.wordId, wordTable.wordText,
+           sentenceTable.meaningId, sentenceTable.sentenceId,
+           snippet(sentenceSearchTable, 0, ?, ?, '...', ?),
+           bm25(sentenceSearchTable) AS score
+        FROM sentenceSearchTable
+        JOIN sentenceTable
+            ON sentenceTable.sentenceId = sentenceSearchTable.rowid
+        JOIN meaningTable
+            ON meaningTable.meaningId = sentenceTable.meaningId
+        JOIN wordTable
+            ON wordTable.wordId = meaningTable.wordId
+        WHERE sentenceSearchTable MATCH ?
+    ORDER BY score
+    LIMIT ?;
     """
 
-SQL_INSERT_MEANING = """
-    INSERT INTO
-        meaningTable (wordId, meaningText,
-                      creationTime, modificationTime, accessTime)
-        VALUES (?, ?, ?, ?, ?);
-    """
+SQL_FETCH_WORD_BY_WORD_ID = """
+    SELECT wordId, wordText,
+           creationTime, modificationTime, accessTime
+        FROM wordTable
+        WHERE wordId == ?;
+    """
+
+SQL_FETCH_WORD_BY_WORD_TEXT = """
+    SELECT wordId, wordText,
+           creationTime, modificationTime, accessTime
+        FROM wordTable
+        WHERE wordText == ?;
+    """
+
+SQL_FETCH_WORDS_BY_WORD_IDS = """
+    SELECT wordId, wordText,
+           creationTime, modificationTime, accessTime
+        FROM wordTable
+        WHERE wordId IN (SELECT value FROM json_each(?));
+    """
+
+SQL_FETCH_WORD_ID_RANGE = """
+    SELECT (SELECT min(wordId) FROM wordTable),
+           (SELECT max(wordId) FROM wordTable);
+    """
+
+SQL_SAMPLE_WORDS = """
+    SELECT wordId, wordText,
+           creationTime, modificationTime, accessTime
+        FROM wordTable
+        WHERE wordId IN (SELECT value FROM json_each(?)){condition};
+    """
+
+SQL_SAMPLE_NEXT_WORDS = """
+    SELECT draw.key, word.wordId, word.wordText,
+           word.creationTime, word.modificationTime, word.accessTime
+        FROM json_each(?) AS draw
+        JOIN wordTable AS word
+            ON word.wordId = (
+                SELECT wordTable.wordId
+                    FROM wordTable
+                    WHERE wordTable.wordId >= draw.value{condition}
+                    ORDER BY wordTable.wordId
+                    LIMIT 1);
+    """
+
+SQL_FETCH_WORD_DETAIL = """
+    SELECT json_object(
+        'wordId', wordTable.wordId,
+        'wordText', wordTable.wordText,
+        'creationTime', wordTable.creationTime,
+        'modificationTime', wordTable.modificationTime,
+        'accessTime', wordTable.accessTime,
+        'meanings', (
+            SELECT json_group_array(json(meaning))
+                FROM (
+                    SELECT json_object(
+                        'meaningId', meaningTable.meaningId,
+                        'meaningText', meaningTable.meaningText,
+                        'sentences', (
+                            SELECT json_group_array(json(sentence))
+                                FROM (
+                                    SELECT json_object(
+                                        'sentenceId', sentenceTable.sentenceId,
+                                        'sentenceText', sentenceTable.sentenceText
+                                    ) AS sentence
+                                        FROM sentenceTable
+                                        WHERE sentenceTable.meaningId
+                                            = meaningTable.meaningId
+                                        ORDER BY sentenceTable.sentenceId
+                                )
+                        )
+                    ) AS meaning
+                        FROM meaningTable
+                        WHERE meaningTable.wordId = wordTable.wordId
+                        ORDER BY meaningTable.meaningId
+                )
+        )
+    )
+        FROM wordTable
+        WHERE {condition};
+    """
+
+SQL_FETCH_WORDS = """
+    SELECT wordId, wordText, {column}
+        FROM wordTable
+        ORDER BY {order}
+        LIMIT ?;
+    """
+
+SQL_FETCH_WORDS_AFTER = """
+    SELECT wordId, wordText, {column}
+        FROM wordTable
+        WHERE ({column}, wordId) {comparison} (?, ?)
+        ORDER BY {order}
+        LIMIT ?;
+    """
+
+SQL_DELETE_WORD_BY_WORD_ID = """
+    DELETE FROM wordTable
+        WHERE wordId == ?
+        RETURNING wordText;
+    """
+
+SQL_UPDATE_ACCESS_TIMES = """
+    UPDATE wordTable
+        SET accessTime = max(wordTable.accessTime, access.accessTime)
+        FROM (
+            SELECT json_extract(value, '$[0]') AS wordId,
+                   json_extract(value, '$[1]') AS accessTime
+                FROM json_each(?)
+        ) AS access
+        WHERE wordTable.wordId = access.wordId
+        RETURNING wordTable.wordId, wordTable.wordText;
+    """
+
+SQL_COMMIT = """COMMIT;"""
+
+PAT_SEARCH_WORD = re.compile(r"^[a-zA-Z0-9- ]+$")
+
+PAT_SEARCH_TERM = re.compile(r"\w+")
+
+SNIPPET_TOKENS = 12
+
+DEFAULT_CACHE_ENTRIES = 4096
+
+DEFAULT_CACHE_BYTES = 16 << 20
+
+DEFAULT_CACHE_TTL = 300.0
+
+# Tags cached listings whose order depends on access times
+ACCESS_ORDER_TAG = ("accessOrder",)
+
+DEFAULT_FLUSH_INTERVAL = 1.0
+
+DEFAULT_FLUSH_SIZE = 1000
+
+DEFAULT_WRITE_BATCH = 256
+
+DEFAULT_STREAM_CHUNK = 500
+
+DEFAULT_MAX_DISTANCE = 2
+
+DEFAULT_STATS_DAYS = 30
+
+SIMILAR_CANDIDATES = 200
+
+MAX_ROW_ID = (1 << 63) - 1
+
+SAMPLE_ROUNDS = 8
+
+SAMPLE_OVERDRAW = 4
+
+SAMPLE_FILTERS = {
+    None: "",
+    "meanings": """
+        AND EXISTS (SELECT 1 FROM meaningTable
+                        WHERE meaningTable.wordId = wordTable.wordId)""",
+    "sentences": """
+        AND EXISTS (SELECT 1 FROM meaningTable
+                        JOIN sentenceTable
+                            ON sentenceTable.meaningId = meaningTable.meaningId
+                        WHERE meaningTable.wordId = wordTable.wordId)""",
+}
+
+MIN_EASE = 1.3
+
+SECONDS_PER_DAY = 86400
+
+EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()
+
+# Marks the tokens of `fetchChanges`, which paged on timestamps before
+SYNC_TOKEN_TAG = "seq"
+
+SYNC_PHASES = (
+    ("words", SQL_SYNC_WORDS,
+     ["wordId", "wordText", "creationTime", "modificationTime"]),
+    ("meanings", SQL_SYNC_MEANINGS,
+     ["meaningId", "wordId", "meaningText",
+      "creationTime", "modificationTime"]),
+    ("sentences", SQL_SYNC_SENTENCES,
+     ["sentenceId", "meaningId", "sentenceText",
+      "creationTime", "modificationTime"]),
+    ("deleted", SQL_SYNC_TOMBSTONES,
+     ["type", "id", "deletionTime"]),
+)
+
+SORT_COLUMNS = {
+    "text": "wordText",
+    "creation": "creationTime",
+    "modification": "modificationTime",
+    "access": "accessTime",
+}
+
+SORT_ALIASES = {
+    "alpha": "text",
+    "time": "access",
+}
+
+SORT_ORDERS = ("asc", "desc")
+
+# The integers that SQLite can store, and so bind as parameters
+INTEGER_RANGE = range(-(1 << 63), 1 << 63)
+
+def sortColumn(sort: str) -> str:
+    sort = SORT_ALIASES.get(sort, sort)
+    if sort not in SORT_COLUMNS:
+        raise ValueError(f"unknown sort mode: {sort}")
+
+    return SORT_COLUMNS[sort]
+
+def orderClause(sort: str, order: str) -> str:
+    """ Build an ORDER BY clause that the word table indexes can serve
+
+    Rows are ordered by wordId within equal sort values, so that the order
+    is total and can be used for keyset pagination.
+    """
+
+    column = sortColumn(sort)
+    if order not in SORT_ORDERS:
+        raise ValueError(f"unknown sort order: {order}")
+
+    return f"{column} {order.upper()}, wordId {order.upper()}"
+
+def prefixRange(prefix: str) -> tuple:
+    """ Return the [lower, upper) key range of words starting with `prefix`
+
+    The range is compared against lower(wordText), so that the lookup can be
+    served by the idxWordTextLower index instead of a case-insensitive LIKE.
+    """
+
+    lower = prefix.lower()
+    upper = lower[:-1] + chr(ord(lower[-1]) + 1)
+
+    return lower, upper
+
+def trigramQuery(keyword: str) -> str:
+    """ Build an FTS5 query matching words sharing any trigram with `keyword` """
+
+    keyword = keyword.lower()
+    trigrams = {keyword[i:i + 3] for i in range(len(keyword) - 2)}
+
+    return " OR ".join(f'"{trigram}"' for trigram in sorted(trigrams))
+
+def matchQuery(text: str) -> str:
+    """ Turn free text into an FTS5 query matching all of its terms
+
+    Every term is quoted, so that user input can never be parsed as FTS5
+    query syntax.
+    """
+
+    return " ".join(f'"{term}"' for term in PAT_SEARCH_TERM.findall(text))
+
+def editDistance(a: str, b: str, maxDistance: int) -> int:
+    """ Return the edit distance of `a` and `b`
+
+    Insertions, deletions, substitutions and transpositions of adjacent
+    characters cost one edit each. Any distance above `maxDistance` is
+    reported as `maxDistance + 1`.
+    """
+
+    if abs(len(a) - len(b)) > maxDistance:
+        return maxDistance + 1
+
+    beforePrevious = None
+    previous = list(range(len(b) + 1))
+    for i, charA in enumerate(a, 1):
+        current = [i]
+        for j, charB in enumerate(b, 1):
+            distance = min(previous[j] + 1,
+                           current[j - 1] + 1,
+                           previous[j - 1] + (charA != charB))
+            if (beforePrevious is not None and j > 1
+                    and charA == b[j - 2] and a[i - 2] == charB):
+                distance = min(distance, beforePrevious[j - 2] + 1)
+            current.append(distance)
+
+        if min(current) > maxDistance and min(previous) > maxDistance:
+            return maxDistance + 1
+
+        beforePrevious = previous
+        previous = current
+
+    return min(previous[-1], maxDistance + 1)
+
+def isInteger(value) -> bool:
+    """ Tell JSON integers that SQLite can bind from bools and bignums
+
+    Python counts bools as ints, and raises OverflowError when binding an
+    int outside the 64-bit range.
+    """
+
+    return (isinstance(value, int) and not isinstance(value, bool)
+            and value in INTEGER_RANGE)
+
+def scheduleReview(state: dict, grade: int, reviewTime: int) -> dict:
+    """ Apply one SM-2 review with `grade` from 0 (blackout) to 5 (perfect)
+
+    Returns the new state with `dueTime` and `reviewTime` set.
+    """
+
+    repetitions = state["repetitions"]
+    lapses = state["lapses"]
+    interval = state["interval"]
+    ease = state["ease"]
+
+    if grade >= 3:
+        if repetitions == 0:
+            interval = 1.0
+        elif repetitions == 1:
+            interval = 6.0
+        else:
+            interval = interval * ease
+        repetitions += 1
+    else:
+        repetitions = 0
+        lapses += 1
+        interval = 1.0
+
+    ease = ease + (0.1 - (5 - grade) * (0.08 + (5 - grade) * 0.02))
+    ease = max(MIN_EASE, ease)
+
+    return {
+        "repetitions": repetitions,
+        "lapses": lapses,
+        "interval": interval,
+        "ease": ease,
+        "dueTime": reviewTime + int(interval * SECONDS_PER_DAY),
+        "reviewTime": reviewTime,
+    }
+
+def encodeToken(values: list) -> str:
+    payload = json.dumps(values, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+def decodeToken(token: str, length: int) -> list:
+    try:
+        padding = "=" * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(token + padding))
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"invalid token: {token}") from e
+
+    if not isinstance(values, list) or len(values) != length:
+        raise ValueError(f"invalid token: {token}")
+
+    return values
+
+def encodeCursor(sortValue, wordId: int) -> str:
+    return encodeToken([sortValue, wordId])
+
+def decodeCursor(cursor: str) -> tuple:
+    sortValue, wordId = decodeToken(cursor, 2)
+
+    # Other JSON values cannot be bound as parameters
+    if not isInteger(wordId):
+        raise ValueError(f"invalid cursor: {cursor}")
+    if not isinstance(sortValue, (str, float)) and not isInteger(sortValue):
+        raise ValueError(f"invalid cursor: {cursor}")
+
+    return sortValue, wordId
+
+def decodeSyncToken(token: str) -> list:
+    """ Return the [start, until, phase, afterSeq, afterId] of a sync token
+
+    Sequence values are -1 before the first change, since rows stamped
+    before the sequence existed carry 0.
+    """
+
+    values = decodeToken(token, 6)
+    tag, state = values[0], values[1:]
+
+    if tag != SYNC_TOKEN_TAG:
+        raise ValueError(f"invalid token: {token}")
+    if not all(isInteger(value) and value >= -1 for value in state):
+        raise ValueError(f"invalid token: {token}")
+
+    return state
+
+DEFAULT_POOL_SIZE = 4
+
+DEFAULT_POOL_TIMEOUT = 5.0
+
+DEFAULT_BATCH_SIZE = 1000
+
+DEFAULT_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -8000,
+    "temp_store": "MEMORY",
+    "foreign_keys": "ON",
+}
+
+# Pragmas that change the database file, which read-only connections skip
+FILE_PRAGMAS = {"journal_mode"}
+
+DEFAULT_LOCK_RETRIES = 5
+
+LOCK_BACKOFF = 0.05
+
+MAX_LOCK_BACKOFF = 2.0
+
+DEFAULT_WATCH_INTERVAL = 1.0
+
+logger = logging.getLogger(__name__)
+
+def statementPatterns() -> tuple:
+    """ Map the text of every `SQL_*` constant to its name
+
+    Templates are returned separately, as patterns in which the
+    placeholders stand for any text.
+    """
+
+    names = {}
+    templates = []
+    for constant, script in globals().items():
+        if not constant.startswith("SQL_"):
+            continue
+        if "{" in script:
+            parts = re.split(r"\{\w+\}", script)
+            pattern = ".+?".join(re.escape(part) for part in parts)
+            templates.append((re.compile(pattern, re.DOTALL), constant))
+        else:
+            names.setdefault(script, constant)
+
+    return names, templates
+
+_statementNames, _statementTemplates = statementPatterns()
+
+def statementName(sql: str) -> str:
+    """ Name `sql` after the `SQL_*` constant it comes from
+
+    Other statements are named after their first keyword.
+    """
+
+    name = _statementNames.get(sql)
+    if name is not None:
+        return name
+
+    for pattern, constant in _statementTemplates:
+        if pattern.fullmatch(sql):
+            name = constant
+            break
+    else:
+        words = sql.split(None, 1)
+        name = words[0].upper() if words else "EMPTY"
+
+    # Only a bounded set of statement texts is ever executed
+    _statementNames[sql] = name
+
+    return name
+
+def isLockError(error: sqlite3.OperationalError) -> bool:
+    message = str(error)
+    return "locked" in message or "busy" in message
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """ A cursor that reports to the `metrics.Metrics` of its connection
+
+    Every statement is timed and counted under the name of its `SQL_*`
+    constant, and statements slower than the slow query threshold are
+    logged.
+    """
+
+    _statement = None
+
+    def record(self, sql: str, startTime: float):
+        metrics = self.connection.metrics
+        elapsed = time.perf_counter() - startTime
+        self._statement = statementName(sql)
+        labels = (("statement", self._statement),)
+
+        metrics.observe("flashcard_statement_seconds", labels, elapsed)
+        if self.rowcount > 0:
+            metrics.increment("flashcard_rows_written_total", labels,
+                              self.rowcount)
+        if elapsed >= metrics.slowQuery:
+            metrics.increment("flashcard_slow_statements_total", labels)
+            logger.warning("slow statement %s took %.3fs",
+                           self._statement, elapsed)
+
+    def fail(self, sql: str, error: sqlite3.OperationalError):
+        if isLockError(error):
+            self.connection.metrics.increment(
+                "flashcard_lock_errors_total",
+                (("statement", statementName(sql)),))
+
+    def execute(self, sql: str, parameters=()):
+        startTime = time.perf_counter()
+        try:
+            super().execute(sql, parameters)
+        except sqlite3.OperationalError as e:
+            self.fail(sql, e)
+            raise
+        self.record(sql, startTime)
+        return self
+
+    def executemany(self, sql: str, parameters):
+        startTime = time.perf_counter()
+        try:
+            super().executemany(sql, parameters)
+        except sqlite3.OperationalError as e:
+            self.fail(sql, e)
+            raise
+        self.record(sql, startTime)
+        return self
+
+    def fetched(self, rows: int, startTime: float):
+        labels = (("statement", self._statement),)
+        metrics = self.connection.metrics
+        metrics.observe("flashcard_fetch_seconds", labels,
+                        time.perf_counter() - startTime)
+        metrics.increment("flashcard_rows_returned_total", labels, rows)
+
+    def fetchone(self):
+        startTime = time.perf_counter()
+        row = super().fetchone()
+        self.fetched(0 if row is None else 1, startTime)
+        return row
+
+    def fetchmany(self, size: int | None=None):
+        startTime = time.perf_counter()
+        if size is None:
+            rows = super().fetchmany()
+        else:
+            rows = super().fetchmany(size)
+        self.fetched(len(rows), startTime)
+        return rows
+
+    def fetchall(self):
+        startTime = time.perf_counter()
+        rows = super().fetchall()
+        self.fetched(len(rows), startTime)
+        return rows
+
+class InstrumentedConnection(sqlite3.Connection):
+    """ A connection whose cursors, and shortcut methods, are instrumented """
+
+    metrics = None
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql: str, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql: str, parameters):
+        return self.cursor().executemany(sql, parameters)
+
+class ConnectionPool(object):
+    """ A fixed-size pool of long-lived SQLite connections
+
+    Connections are opened lazily up to `size`, configured with `pragmas`
+    once when they are opened, and then handed out to one caller at a time.
+    The database directory is created and the schema migrated once, when
+    the pool is constructed, instead of on every call. With `metrics`, every
+    statement and checkout is timed.
+
+    A `readOnly` pool opens the database with `mode=ro`, so its connections
+    never take the write lock; the database must already exist, and is
+    neither created nor migrated. `timeout` is also the busy timeout of
+    every connection, and `retries` bounds `retry`.
+    """
+
+    def __init__(self, dbPath: str, size: int=DEFAULT_POOL_SIZE,
+                 pragmas: dict | None=None,
+                 timeout: float=DEFAULT_POOL_TIMEOUT,
+                 metrics=None, readOnly: bool=False,
+                 retries: int=DEFAULT_LOCK_RETRIES) -> None:
+        self._dbPath = dbPath
+        self._dbDir = os.path.dirname(dbPath)
+        self._size = size
+        self._timeout = timeout
+        self._pragmas = DEFAULT_PRAGMAS if pragmas is None else pragmas
+        self._metrics = metrics
+        self._readOnly = readOnly
+        self._retries = retries
+
+        self._idle = queue.LifoQueue(maxsize=size)
+        self._lock = threading.Lock()
+        self._opened = 0
+        self._closed = False
+
+        if not readOnly:
+            self.createDatabase()
+
+    @property
+    def dbPath(self) -> str:
+        return self._dbPath
+
+    @property
+    def metrics(self):
+        return self._metrics
+
+    @property
+    def readOnly(self) -> bool:
+        return self._readOnly
+
+    def createDatabase(self):
+        """ Create the database if needed and migrate it to the latest schema
+
+        This runs once per pool; per-call code never touches the schema.
+        """
+
+        from . import migration
+
+        if self._dbDir and not os.path.isdir(self._dbDir):
+            os.makedirs(self._dbDir)
+
+        dbConn = self.acquire()
+        try:
+            migration.migrate(dbConn)
+        finally:
+            self.release(dbConn)
+
+    def openConnection(self) -> sqlite3.Connection:
+        """ Open a connection into a slot already reserved by `acquire` """
+
+        if self._metrics is None:
+            factory = sqlite3.Connection
+        else:
+            factory = InstrumentedConnection
+
+        if self._readOnly:
+            path = pathlib.Path(self._dbPath).resolve().as_uri() + "?mode=ro"
+        else:
+            path = self._dbPath
+
+        try:
+            dbConn = sqlite3.connect(path, timeout=self._timeout,
+                                     isolation_level=None,
+                                     check_same_thread=False,
+                                     factory=factory, uri=self._readOnly)
+            if self._metrics is not None:
+                dbConn.metrics = self._metrics
+            for name, value in self._pragmas.items():
+                if self._readOnly and name in FILE_PRAGMAS:
+                    continue
+                dbConn.execute(f"PRAGMA {name} = {value};")
+        except Exception:
+            with self._lock:
+                self._opened -= 1
+            raise
+
+        return dbConn
+
+    def acquire(self) -> sqlite3.Connection:
+        if self._metrics is None:
+            return self.checkout()
+
+        startTime = time.perf_counter()
+        dbConn = self.checkout()
+        self._metrics.observe("flashcard_pool_acquire_seconds", (),
+                              time.perf_counter() - startTime)
+
+        return dbConn
+
+    def checkout(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        # Reserve the slot under the lock, so that concurrent acquires
+        # cannot open more than `size` connections between them
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("connection pool is closed")
+            canOpen = self._opened < self._size
+            if canOpen:
+                self._opened += 1
+
+        if canOpen:
+            return self.openConnection()
+
+        try:
+            return self._idle.get(timeout=self._timeout)
+        except queue.Empty:
+            raise TimeoutError("timed out waiting for a database connection")
+
+    def release(self, dbConn: sqlite3.Connection):
+        if dbConn.in_transaction:
+            dbConn.rollback()
+
+        with self._lock:
+            closed = self._closed
+
+        if closed:
+            dbConn.close()
+            with self._lock:
+                self._opened -= 1
+            return
+
+        self._idle.put_nowait(dbConn)
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+
+        while True:
+            try:
+                dbConn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            dbConn.close()
+            with self._lock:
+                self._opened -= 1
+
+    def retry(self, operation):
+        """ Call `operation`, and call it again while the database is locked
+
+        SQLite itself waits up to `timeout` for a lock. Writers in other
+        processes can keep it longer than that, so an operation that still
+        fails with a lock error is retried up to `retries` times, after a
+        random delay under an exponentially growing bound; the jitter keeps
+        competing writers from retrying in step. `operation` must leave no
+        state behind when it fails, which holds for a transaction on a
+        connection released back to the pool.
+        """
+
+        for attempt in itertools.count():
+            try:
+                return operation()
+            except sqlite3.OperationalError as e:
+                if not isLockError(e) or attempt >= self._retries:
+                    raise
+
+            if self._metrics is not None:
+                self._metrics.increment("flashcard_lock_retries_total")
+
+            time.sleep(random.uniform(0, min(LOCK_BACKOFF * 2 ** attempt,
+                                             MAX_LOCK_BACKOFF)))
+
+def retriedOnLock(method):
+    """ Run a write method of `Connection` through `ConnectionPool.retry` """
+
+    @functools.wraps(method)
+    def retried(self, *args, **kwargs):
+        return self._pool.retry(functools.partial(method, self, *args,
+                                                  **kwargs))
+
+    return retried
+
+class WordCache(object):
+    """ A thread-safe LRU cache of serialized read results
+
+    Entries expire after `ttl` seconds and the least recently used ones are
+    evicted once there are more than `maxEntries` entries or `maxBytes` bytes
+    of values. Every entry carries tags describing what it was read from, and
+    writers invalidate the tags they touched after committing. A value read
+    before an invalidation is never stored afterwards, see `generation`.
+    """
+
+    def __init__(self, maxEntries: int=DEFAULT_CACHE_ENTRIES,
+                 maxBytes: int=DEFAULT_CACHE_BYTES,
+                 ttl: float | None=DEFAULT_CACHE_TTL) -> None:
+        self._maxEntries = maxEntries
+        self._maxBytes = maxBytes
+        self._ttl = ttl
+
+        self._lock = threading.Lock()
+        self._entries = collections.OrderedDict()
+        self._tags = {}
+        self._bytes = 0
+        self._generation = 0
+
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+
+    @property
+    def generation(self) -> int:
+        """ A counter that changes on every invalidation
+
+        Read it before loading a value and pass it to `put`, so that a value
+        loaded concurrently with a write is dropped instead of cached.
+        """
+
+        with self._lock:
+            return self._generation
+
+    def get(self, key: tuple) -> str | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+
+            value, tags, expiry = entry
+            if expiry is not None and expiry < time.monotonic():
+                self._remove(key)
+                self._misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self._hits += 1
+
+            return value
+
+    def put(self, key: tuple, value: str, tags: list, generation: int):
+        if len(value) > self._maxBytes:
+            return
+
+        expiry = None if not self._ttl else time.monotonic() + self._ttl
+
+        with self._lock:
+            if generation != self._generation:
+                return
+
+            if key in self._entries:
+                self._remove(key)
+
+            self._entries[key] = (value, tags, expiry)
+            self._bytes += len(value)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+
+            while (len(self._entries) > self._maxEntries
+                   or self._bytes > self._maxBytes):
+                self._remove(next(iter(self._entries)))
+                self._evictions += 1
+
+    def _remove(self, key: tuple):
+        """ Drop one entry; the caller must hold the lock """
+
+        value, tags, expiry = self._entries.pop(key)
+        self._bytes -= len(value)
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def invalidate(self, tags: list):
+        with self._lock:
+            self._generation += 1
+            for tag in tags:
+                for key in list(self._tags.get(tag, ())):
+                    self._remove(key)
+                    self._invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._tags.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "invalidations": self._invalidations,
+            }
+
+def wordTags(wordId: int | None, wordText: str) -> list:
+    """ Tags of cache entries read from a single word """
+
+    tags = [("wordText", wordText)]
+    if wordId is not None:
+        tags.append(("wordId", wordId))
+
+    return tags
+
+def changedWordTags(wordId: int | None, wordText: str) -> list:
+    """ Tags of every cache entry a write to one word can make stale """
+
+    tags = wordTags(wordId, wordText)
+    tags.append(("words",))
+
+    lowerText = wordText.lower()
+    for i in range(1, len(lowerText) + 1):
+        tags.append(("prefix", lowerText[:i]))
+
+    return tags
+
+class AccessTimeBuffer(object):
+    """ Write-behind buffer for word access times
+
+    Reads record the ids of the words they returned; repeated reads of a
+    word are coalesced into its latest access time. A background thread
+    writes the buffered times in one transaction every `flushInterval`
+    seconds, or as soon as `flushSize` words are pending. `close` stops the
+    thread after a final flush.
+    """
+
+    def __init__(self, pool: ConnectionPool, cache: WordCache | None=None,
+                 flushInterval: float=DEFAULT_FLUSH_INTERVAL,
+                 flushSize: int=DEFAULT_FLUSH_SIZE) -> None:
+        self._pool = pool
+        self._cache = cache
+        self._flushInterval = flushInterval
+        self._flushSize = flushSize
+
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._pending = {}
+        self._closed = False
+
+        self._thread = threading.Thread(target=self.run,
+                                        name="AccessTimeBuffer", daemon=True)
+        self._thread.start()
+
+    def record(self, wordIds: list, accessTime: int | None=None):
+        if not wordIds:
+            return
+
+        if accessTime is None:
+            accessTime = int(datetime.datetime.utcnow().timestamp())
+
+        with self._lock:
+            for wordId in wordIds:
+                if self._pending.get(wordId, 0) < accessTime:
+                    self._pending[wordId] = accessTime
+
+            if len(self._pending) >= self._flushSize:
+                self._wakeup.notify()
+
+    def run(self):
+        while True:
+            with self._lock:
+                if not self._closed and len(self._pending) < self._flushSize:
+                    self._wakeup.wait(self._flushInterval)
+                closed = self._closed
+
+            # A failed flush keeps its times and is retried on the next tick
+            try:
+                self.flush()
+            except (sqlite3.Error, TimeoutError):
+                pass
+
+            if closed:
+                break
+
+    def flush(self):
+        with self._lock:
+            pending = self._pending
+            self._pending = {}
+
+        if not pending:
+            return
+
+        try:
+            dbConn = self._pool.acquire()
+            try:
+                dbConn.execute("BEGIN IMMEDIATE TRANSACTION;")
+                dbCurs = dbConn.execute(SQL_UPDATE_ACCESS_TIMES,
+                                        (json.dumps(list(pending.items())),))
+                words = dbCurs.fetchall()
+                if words:
+                    dbConn.execute(SQL_COUNT_ACCESS_FLUSH)
+                dbConn.execute(SQL_COMMIT)
+            finally:
+                self._pool.release(dbConn)
+        except Exception:
+            # Keep the times for the next flush unless newer ones arrived
+            with self._lock:
+                for wordId, accessTime in pending.items():
+                    if self._pending.get(wordId, 0) < accessTime:
+                        self._pending[wordId] = accessTime
+            raise
+
+        # Access times only show in the entries of the words themselves and
+        # in the order of listings sorted by them
+        if self._cache is not None and words:
+            tags = [ACCESS_ORDER_TAG]
+            for wordId, wordText in words:
+                tags += wordTags(wordId, wordText)
+            self._cache.invalidate(tags)
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._wakeup.notify()
+
+        self._thread.join()
+
+class WordWriter(object):
+    """ A single writer thread committing queued writes in groups
+
+    Request handlers submit insert and delete jobs and wait on the returned
+    futures. The writer takes every job queued at the start of a tick, up to
+    `maxBatch`, and runs them in one transaction, each inside its own
+    savepoint so that a conflicting job fails alone. Futures resolve once
+    the transaction has been committed, so one fsync is paid per group
+    instead of per word.
+    """
+
+    def __init__(self, pool: ConnectionPool,
+                 maxBatch: int=DEFAULT_WRITE_BATCH) -> None:
+        self._pool = pool
+        self._maxBatch = maxBatch
+        self._jobs = queue.Queue()
+        self._closed = False
+
+        self._thread = threading.Thread(target=self.run,
+                                        name="WordWriter", daemon=True)
+        self._thread.start()
+
+    def submit(self, sql: str, params: tuple) -> concurrent.futures.Future:
+        """ Queue one write statement
+
+        The future resolves to the statement's RETURNING row, or None when
+        it returned no row or violated a constraint.
+        """
+
+        if self._closed:
+            raise RuntimeError("word writer is closed")
+
+        future = concurrent.futures.Future()
+        self._jobs.put((sql, params, future))
+
+        return future
+
+    def run(self):
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                break
+
+            jobs = [job]
+            stop = False
+            while len(jobs) < self._maxBatch:
+                try:
+                    job = self._jobs.get_nowait()
+                except queue.Empty:
+                    break
+                if job is None:
+                    stop = True
+                    break
+                jobs.append(job)
+
+            self.commit(jobs)
+
+            if stop:
+                break
+
+    def commit(self, jobs: list):
+        """ Run `jobs` in one transaction, retried while the database is locked
+        """
+
+        def transaction() -> list:
+            results = []
+
+            dbConn = self._pool.acquire()
+            try:
+                dbConn.execute("BEGIN IMMEDIATE TRANSACTION;")
+
+                for sql, params, future in jobs:
+                    dbConn.execute("SAVEPOINT job;")
+                    try:
+                        results.append(dbConn.execute(sql, params).fetchone())
+                    except sqlite3.IntegrityError:
+                        results.append(None)
+                        dbConn.execute("ROLLBACK TO job;")
+                    except sqlite3.Error as e:
+                        results.append(e)
+                        dbConn.execute("ROLLBACK TO job;")
+                    dbConn.execute("RELEASE job;")
+
+                dbConn.execute(SQL_COMMIT)
+
+            finally:
+                self._pool.release(dbConn)
+
+            return results
+
+        try:
+            results = self._pool.retry(transaction)
+        except Exception as e:
+            for sql, params, future in jobs:
+                future.set_exception(e)
+            return
+
+        for (sql, params, future), result in zip(jobs, results):
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def close(self):
+        if self._closed:
+            return
+
+        self._closed = True
+        self._jobs.put(None)
+        self._thread.join()
+
+class ChangeWatcher(object):
+    """ Keeps a `WordCache` coherent with writes from other processes
+
+    Writes invalidate the cache entries they make stale, but only in the
+    process that made them. When several processes serve one database, a
+    background thread of each reads the change counter every `interval`
+    seconds and clears the cache whenever the counter has moved, so entries
+    are stale for at most one interval. Access times are not counted as
+    changes and may be stale for up to the cache TTL.
+    """
+
+    def __init__(self, pool: ConnectionPool, cache: WordCache,
+                 interval: float=DEFAULT_WATCH_INTERVAL) -> None:
+        self._pool = pool
+        self._cache = cache
+        self._interval = interval
+        self._changeCount = None
+        self._stop = threading.Event()
+
+        self._thread = threading.Thread(target=self.run,
+                                        name="ChangeWatcher", daemon=True)
+        self._thread.start()
+
+    def run(self):
+        while not self._stop.wait(self._interval):
+            # A failed check is repeated on the next tick
+            try:
+                self.check()
+            except (sqlite3.Error, TimeoutError):
+                pass
+
+    def check(self):
+        dbConn = self._pool.acquire()
+        try:
+            changeCount = dbConn.execute(SQL_FETCH_CHANGE_STATE,
+                                         (None,)).fetchone()[0]
+        finally:
+            self._pool.release(dbConn)
+
+        if self._changeCount is not None and changeCount != self._changeCount:
+            self._cache.clear()
+        self._changeCount = changeCount
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+
+_pools = {}
+
+_poolsLock = threading.Lock()
+
+def getPool(dbPath: str) -> ConnectionPool:
+    """ Return the shared pool for `dbPath`, creating it on first use """
+
+    with _poolsLock:
+        pool = _pools.get(dbPath)
+        if pool is None:
+            pool = ConnectionPool(dbPath)
+            _pools[dbPath] = pool
+
+    return pool
+
+class Connection(object):
+
+    def __init__(self, dbPath: str,
+                 pool: ConnectionPool | None=None,
+                 cache: WordCache | None=None,
+                 accessTimes: AccessTimeBuffer | None=None,
+                 writer: WordWriter | None=None) -> None:
+        self._dbPath = dbPath
+        self._pool = pool if pool is not None else getPool(dbPath)
+        self._cache = cache
+        self._accessTimes = accessTimes
+        self._writer = writer
+        self._dbConn = None
+        self._dbCurs = None
+
+    def openDatabase(self):
+        self._dbConn = self._pool.acquire()
+        self._dbCurs = self._dbConn.cursor()
+
+    def closeDatabase(self):
+        if self._dbConn is None:
+            return
+
+        self._dbCurs.close()
+        self._pool.release(self._dbConn)
+        self._dbCurs = None
+        self._dbConn = None
+
+    def cacheGet(self, key: tuple):
+        if self._cache is None:
+            return None
+
+        value = self._cache.get(key)
+        if value is None:
+            return None
+
+        return json.loads(value)
+
+    def cacheGeneration(self) -> int | None:
+        if self._cache is None:
+            return None
+
+        return self._cache.generation
+
+    def cachePut(self, key: tuple, value, tags: list, generation: int | None):
+        if self._cache is None:
+            return
+
+        self._cache.put(key, json.dumps(value), tags, generation)
+
+    def recordAccess(self, wordIds: list):
+        if self._accessTimes is None:
+            return
+
+        self._accessTimes.record(wordIds)
+
+    def cacheInvalidate(self, tags: list):
+        if self._cache is None:
+            return
+
+        self._cache.invalidate(tags)
+
+    def searchWord(self, keyword: str, fuzzy: bool=False,
+                   max: int=10, sortByTime: bool=False,
+                   sort: str | None=None, order: str | None=None) -> list:
+        if not PAT_SEARCH_WORD.match(keyword):
+            return []
+
+        if sort is None:
+            sort = "access" if sortByTime else "text"
+        if order is None:
+            order = "asc" if sortByTime else "desc"
+
+        orderSnip = orderClause(sort, order)
+
+        key = ("searchWord", keyword, fuzzy, max, sort, order)
+        words = self.cacheGet(key)
+        if words is not None:
+            self.recordAccess([word["wordId"] for word in words])
+            return words
+
+        generation = self.cacheGeneration()
+
+        self.openDatabase()
+
+        if not fuzzy:
+            self._dbCurs.execute(SQL_SEARCH_WORD, (keyword, max))
+            words = self._dbCurs.fetchall()
+            tags = [("wordText", keyword)]
+        else:
+            # By text, the lower(wordText) index serves both range and order
+            if sortColumn(sort) == "wordText":
+                sql = SQL_FUZZY_SEARCH_WORD.format(direction=order.upper())
+            else:
+                sql = SQL_FUZZY_SEARCH_WORD_BY_TIME.format(order=orderSnip)
+            self._dbCurs.execute(sql, prefixRange(keyword) + (max,))
+            words = self._dbCurs.fetchall()
+            tags = [("prefix", keyword.lower())]
+            if sortColumn(sort) == "accessTime":
+                tags.append(ACCESS_ORDER_TAG)
+
+        self.closeDatabase()
+
+        words = [dict(zip(["wordId", "wordText"], word)) for word in words]
+
+        self.cachePut(key, words, tags, generation)
+
+        self.recordAccess([word["wordId"] for word in words])
+
+        return words
+
+    def suggestWords(self, prefix: str, max: int=10) -> list:
+        """ Return up to `max` words starting with `prefix`, ignoring case """
+
+        if not PAT_SEARCH_WORD.match(prefix):
+            return []
+
+        self.openDatabase()
+
+        self._dbCurs.execute(SQL_SUGGEST_WORD, prefixRange(prefix) + (max,))
+        words = self._dbCurs.fetchall()
+
+        self.closeDatabase()
+
+        words = [dict(zip(["wordId", "wordText"], word)) for word in words]
+
+        return words
+
+    def searchSimilarWords(self, keyword: str,
+                           maxDistance: int=DEFAULT_MAX_DISTANCE,
+                           max: int=10) -> list:
+        """ Return words within `maxDistance` edits of `keyword`
+
+        Candidates are drawn from the trigram index, and from words with the
+        same first letter when that yields too few matches. Either query
+        stops after `SIMILAR_CANDIDATES` rows instead of ranking every word
+        that shares a trigram, so the work per lookup is bounded whatever
+        the size of the table; on a large one, a match beyond the first
+        candidates can be missed. Results are ordered by distance, then
+        alphabetically.
+        """
+
+        if not PAT_SEARCH_WORD.match(keyword):
+            return []
+
+        keyword = keyword.lower()
+        minLength = len(keyword) - maxDistance
+        maxLength = len(keyword) + maxDistance
+
+        def candidates():
+            if len(keyword) >= 3:
+                self._dbCurs.execute(SQL_SIMILAR_WORD_CANDIDATES,
+                                     (trigramQuery(keyword), minLength,
+                                      maxLength, SIMILAR_CANDIDATES))
+                yield self._dbCurs.fetchall()
+
+            # Short words may share no trigram with their misspelling
+            self._dbCurs.execute(SQL_SIMILAR_SHORT_WORD_CANDIDATES,
+                                 prefixRange(keyword[0])
+                                 + (minLength, maxLength, SIMILAR_CANDIDATES))
+            yield self._dbCurs.fetchall()
+
+        words = {}
+
+        self.openDatabase()
+
+        for rows in candidates():
+            for wordId, wordText in rows:
+                if wordId in words:
+                    continue
+                distance = editDistance(keyword, wordText.lower(), maxDistance)
+                if distance <= maxDistance:
+                    words[wordId] = {
+                        "wordId": wordId,
+                        "wordText": wordText,
+                        "distance": distance,
+                    }
+            if len(words) >= max:
+                break
+
+        self.closeDatabase()
+
+        words = list(words.values())
+        words.sort(key=lambda word: (word["distance"], word["wordText"]))
+
+        return words[:max]
+
+    def sampleWords(self, n: int=10, seed: int | None=None,
+                    having: str | None=None) -> list:
+        """ Draw up to `n` distinct words uniformly at random
+
+        Ids are drawn from the `wordId` range and looked up through the
+        primary key; ids that fall into gaps left by deletions, or that miss
+        the `having` filter ("meanings" or "sentences"), are drawn again.
+        Should the id space be too sparse for that, the remaining words are
+        taken as the next rows after random ids, which slightly favours words
+        that follow a gap. Both steps look up a whole round of draws in one
+        query and stop after `SAMPLE_ROUNDS` rounds, so fewer than `n` words
+        can be returned when few match. The same `seed` on the same data
+        gives the same words.
+        """
+
+        if having not in SAMPLE_FILTERS:
+            raise ValueError(f"unknown sample filter: {having}")
+
+        condition = SAMPLE_FILTERS[having]
+        generator = random.Random(seed)
+        words = {}
 
-SQL_INSERT_SENTENCE = """
-    INSERT INTO
-        sentenceTable (meaningId, sentenceText,
-                       creationTime, modificationTime, accessTime)
-        VALUES (?, ?, ?, ?, ?);
-    """
+        self.openDatabase()
 
-SQL_QUERY_WORD_ID = """
-    SELECT wordId FROM wordTable WHERE wordText = ?;
-    """
+        self._dbCurs.execute(SQL_FETCH_WORD_ID_RANGE)
+        minId, maxId = self._dbCurs.fetchone()
+
+        if minId is not None:
+            sql = SQL_SAMPLE_WORDS.format(condition=condition)
+            for _ in range(SAMPLE_ROUNDS):
+                missing = n - len(words)
+                if missing <= 0:
+                    break
+
+                wordIds = [generator.randint(minId, maxId)
+                           for _ in range(missing * SAMPLE_OVERDRAW)]
+                self._dbCurs.execute(sql, (json.dumps(wordIds),))
+                found = {result[0]: result
+                         for result in self._dbCurs.fetchall()}
+
+                # Keep the order of the draws so a seed is reproducible
+                for wordId in wordIds:
+                    if wordId in found and len(words) < n:
+                        words.setdefault(wordId, found[wordId])
+
+            sql = SQL_SAMPLE_NEXT_WORDS.format(condition=condition)
+            for _ in range(SAMPLE_ROUNDS):
+                missing = n - len(words)
+                if missing <= 0:
+                    break
+
+                wordIds = [generator.randint(minId, maxId)
+                           for _ in range(missing * SAMPLE_OVERDRAW)]
+                self._dbCurs.execute(sql, (json.dumps(wordIds),))
+
+                # The first column is the index of the draw
+                for result in sorted(self._dbCurs.fetchall()):
+                    if len(words) < n:
+                        words.setdefault(result[1], result[1:])
 
-SQL_QUERY_MEANING_ID = """
-    SELECT meaningId FROM meaningTable WHERE meaningText = ?;
-    """
+        self.closeDatabase()
 
-SQL_QUERY_SENTENCE_ID = """
-    SELECT sentenceId FROM sentenceTable WHERE sentenceText = ?;
-    """
+        keys = ["wordId", "wordText",
+                "creationTime", "modificationTime", "accessTime"]
+        words = [dict(zip(keys, word)) for word in words.values()]
 
-SQL_SEARCH_WORD = """
-    SELECT wordId, wordText
-        FROM wordTable
-        WHERE wordText = ?
-        ORDER BY ?
-        LIMIT ?;
-    """
+        return words
 
-SQL_FUZZY_SEARCH_WORD = """
-    SELECT wordId, wordText
-        FROM wordTable
-        WHERE wordText LIKE ?
-        ORDER BY ?
-        LIMIT ?;
-    """
+    def searchText(self, text: str, max: int=10,
+                   highlight: tuple=("<b>", "</b>")) -> list:
+        """ Search meanings and example sentences for all terms of `text`
 
-SQL_FETCH_WORD_BY_WORD_ID = """
-    SELECT wordId, wordText,
-           creationTime, modificationTime, accessTime
-        FROM wordTable
-        WHERE wordId == ?;
-    """
+        Hits are ranked by BM25 and carry a snippet of the matching text with
+        the terms wrapped in `highlight`.
+        """
 
-SQL_FETCH_WORD_BY_WORD_TEXT = """
-    SELECT wordId, wordText,
-           creationTime, modificationTime, accessTime
-        FROM wordTable
-        WHERE wordText == ?;
-    """
+        query = matchQuery(text)
+        if not query:
+            return []
 
-SQL_FETCH_WORDS = """
-    SELECT wordId, wordText
-        FROM wordTable
-        ORDER BY ?
-        LIMIT ?;
-    """
+        start, end = highlight
+        snippetArgs = (start, end, SNIPPET_TOKENS, query)
 
-SQL_DELETE_WORD_BY_WORD_ID = """
-    DELETE FROM wordTable
-        WHERE wordId == ?;
-    """
+        self.openDatabase()
 
-SQL_COMMIT = """COMMIT;"""
+        self._dbCurs.execute(SQL_SEARCH_TEXT,
+                             snippetArgs + snippetArgs + (max,))
+        hits = self._dbCurs.fetchall()
 
-PAT_SEARCH_WORD = re.compile(r"^[a-zA-Z0-9- ]+$")
+        self.closeDatabase()
 
-class Connection(object):
+        keys = ["type", "wordId", "wordText", "meaningId", "sentenceId",
+                "snippet", "score"]
+        hits = [dict(zip(keys, hit)) for hit in hits]
 
-    def __init__(self, dbPath: str) -> None:
-        self._dbPath = dbPath
-        self._dbDir = os.path.dirname(dbPath)
+        return hits
 
-    def openDatabase(self):
-        if not os.path.isdir(self._dbDir):
-            os.makedirs(self._dbDir)
+    def compact(self) -> dict:
+        """ Remove orphaned meanings and sentences and reclaim their space
 
-        if not os.path.isfile(self._dbPath):
-            self._dbConn = sqlite3.connect(self._dbPath)
-            self._dbCurs = self._dbConn.cursor()
+        Orphans are left behind by deletes made before deletes cascaded.
+        The search indexes are merged, the file is vacuumed and the WAL is
+        truncated afterwards.
+        """
 
-            self._dbCurs.execute(SQL_CREATE_WORD_TABLE)
-            self._dbCurs.execute(SQL_CREATE_MEANING_TABLE)
-            self._dbCurs.execute(SQL_CREATE_SENTENCE_TABLE)
-        else:
-            self._dbConn = sqlite3.connect(self._dbPath)
-            self._dbCurs = self._dbConn.cursor()
+        self.openDatabase()
 
-    def closeDatabase(self):
-        self._dbCurs.close()
-        self._dbConn.close()
+        try:
+            self._dbCurs.execute("BEGIN IMMEDIATE TRANSACTION;")
 
-    def searchWord(self, keyword: str, fuzzy: bool=False,
-                   max: int=10, sortByTime: bool=False) -> list:
-        if not PAT_SEARCH_WORD.match(keyword):
-            return []
+            # Sentences of orphaned meanings go with them through the
+            # cascade, so count sentences before and after
+            self._dbCurs.execute(SQL_COUNT_SENTENCES)
+            sentenceCount = self._dbCurs.fetchone()[0]
+
+            self._dbCurs.execute(SQL_DELETE_ORPHAN_MEANINGS)
+            meaningCount = self._dbCurs.rowcount
+
+            self._dbCurs.execute(SQL_DELETE_ORPHAN_SENTENCES)
+
+            self._dbCurs.execute(SQL_COUNT_SENTENCES)
+            sentenceCount -= self._dbCurs.fetchone()[0]
+
+            for table in ("wordTrigramTable", "meaningSearchTable",
+                          "sentenceSearchTable"):
+                self._dbCurs.execute(
+                    SQL_OPTIMIZE_SEARCH_TABLE.format(table=table))
+
+            self._dbCurs.execute(SQL_COMMIT)
+
+            pageCount = self._dbCurs.execute("PRAGMA page_count;").fetchone()[0]
+            self._dbCurs.execute("VACUUM;")
+            self._dbCurs.execute("PRAGMA wal_checkpoint(TRUNCATE);")
+            self._dbCurs.execute("PRAGMA optimize;")
+            pageDelta = (pageCount
+                         - self._dbCurs.execute("PRAGMA page_count;").fetchone()[0])
+
+        finally:
+            self.closeDatabase()
+
+        if self._cache is not None:
+            self._cache.clear()
+
+        response = {
+            "orphanMeanings": meaningCount,
+            "orphanSentences": sentenceCount,
+            "reclaimedPages": pageDelta,
+        }
+
+        return response
+
+    def fetchDueCards(self, max: int=20, now: int | None=None) -> list:
+        """ Return up to `max` cards due at `now`, most overdue first """
+
+        if now is None:
+            now = int(datetime.datetime.utcnow().timestamp())
 
         self.openDatabase()
 
-        sortStmtSnip = "accessTime ASC" if sortByTime else "wordText DESC"
+        self._dbCurs.execute(SQL_FETCH_DUE_CARDS, (now, max))
+        cards = self._dbCurs.fetchall()
 
-        if not fuzzy:
-            self._dbCurs.execute(SQL_SEARCH_WORD,
-                                 (keyword, sortStmtSnip, max))
-            words = self._dbCurs.fetchall()
+        self.closeDatabase()
+
+        keys = ["wordId", "wordText", "repetitions", "lapses", "interval",
+                "ease", "dueTime", "reviewTime"]
+        cards = [dict(zip(keys, card)) for card in cards]
+
+        return cards
+
+    @retriedOnLock
+    def answerCards(self, answers: list) -> list:
+        """ Record a batch of review grades in one transaction
+
+        Every answer is a dict with an integer `wordId`, a `grade` from 0 to
+        5 and an optional integer `reviewTime`, and gets a `status` of "ok",
+        "not_found" or "invalid".
+        Answers for the same card are applied in order.
+        """
+
+        timestamp = int(datetime.datetime.utcnow().timestamp())
+        responses = []
+
+        self.openDatabase()
+
+        try:
+            self._dbCurs.execute("BEGIN IMMEDIATE TRANSACTION;")
+
+            for answer in answers:
+                if (not isinstance(answer, dict)
+                        or not isInteger(answer.get("wordId"))
+                        or not isInteger(answer.get("grade"))
+                        or answer["grade"] not in range(6)
+                        or not isInteger(answer.get("reviewTime", timestamp))):
+                    responses.append({"status": "invalid"})
+                    continue
+
+                wordId = answer["wordId"]
+                reviewTime = answer.get("reviewTime", timestamp)
+
+                self._dbCurs.execute(SQL_FETCH_REVIEW_STATE, (wordId,))
+                result = self._dbCurs.fetchone()
+                if result is None:
+                    responses.append({"wordId": wordId,
+                                      "status": "not_found"})
+                    continue
+
+                state = dict(zip(["repetitions", "lapses", "interval",
+                                  "ease"], result))
+                state = scheduleReview(state, answer["grade"], reviewTime)
+
+                self._dbCurs.execute(SQL_UPDATE_REVIEW_STATE,
+                                     (state["repetitions"], state["lapses"],
+                                      state["interval"], state["ease"],
+                                      state["dueTime"], reviewTime, wordId))
+                self._dbCurs.execute(SQL_INSERT_REVIEW_LOG,
+                                     (wordId, answer["grade"],
+                                      state["interval"], state["ease"],
+                                      reviewTime))
+
+                responses.append(dict(state, wordId=wordId, status="ok"))
+
+            self._dbCurs.execute(SQL_COMMIT)
+
+        finally:
+            self.closeDatabase()
+
+        return responses
+
+    def fetchChanges(self, since: str | None=None, max: int=500) -> dict:
+        """ Fetch words, meanings and sentences changed since a sync token
+
+        Rows modified and rows deleted after the token are returned, up to
+        `max` in total per call. `next` is the token for the following
+        call; while `more` is true the client should keep paging. A token of
+        None fetches everything.
+
+        Tokens page on the change sequence that the triggers stamp on every
+        row, not on timestamps: stamps follow commit order, so a row that
+        commits after a sync started, or whose `modificationTime` lies in
+        the past, still has a stamp above the token and is picked up by the
+        next sync. A sync covers the stamps up to the change counter at its
+        start; rows changed while it pages are returned by the next one.
+        """
+
+        if since is not None:
+            state = decodeSyncToken(since)
+
+        self.openDatabase()
+
+        if since is None or state[2] >= len(SYNC_PHASES):
+            self._dbCurs.execute(SQL_FETCH_CHANGE_STATE, (None,))
+            changeCount = self._dbCurs.fetchone()[0]
+            start = -1 if since is None else state[1]
+            state = [start, changeCount, 0, start, MAX_ROW_ID]
+
+        start, until, phase, afterSeq, afterId = state
+
+        response = {name: [] for name, sql, keys in SYNC_PHASES}
+        remaining = max
+
+        while phase < len(SYNC_PHASES) and remaining > 0:
+            name, sql, keys = SYNC_PHASES[phase]
+
+            # The first two columns are the keyset position of the row
+            self._dbCurs.execute(sql, (afterSeq, afterId, until, remaining))
+            rows = self._dbCurs.fetchall()
+
+            response[name] += [dict(zip(keys, row[2:])) for row in rows]
+            remaining -= len(rows)
+
+            if len(rows) > 0:
+                afterSeq, afterId = rows[-1][0], rows[-1][1]
+
+            if remaining > 0:
+                phase += 1
+                afterSeq, afterId = start, MAX_ROW_ID
+
+        self.closeDatabase()
+
+        more = phase < len(SYNC_PHASES)
+        if more:
+            next = [start, until, phase, afterSeq, afterId]
         else:
-            self._dbCurs.execute(SQL_FUZZY_SEARCH_WORD,
-                                 (keyword + "%", sortStmtSnip, max))
-            words = self._dbCurs.fetchall()
+            next = [until, until, len(SYNC_PHASES), 0, 0]
+
+        response["next"] = encodeToken([SYNC_TOKEN_TAG] + next)
+        response["more"] = more
+
+        return response
+
+    def fetchChangeState(self, wordId: int | None=None) -> dict:
+        """ Read the validators of the data, without reading the data
+
+        `changeCount` grows with every change to a word, meaning or sentence
+        and `changeTime` is the time of the latest one. With `wordId`, the
+        word's `modificationTime` is included; it is None for unknown words.
+        Access times are not changes; `accessCount` and `accessTime` count
+        and date the flushes of access times instead.
+        """
+
+        self.openDatabase()
+
+        self._dbCurs.execute(SQL_FETCH_CHANGE_STATE, (wordId,))
+        result = self._dbCurs.fetchone()
 
         self.closeDatabase()
 
-        words = [dict(zip(["wordId", "wordText"], word)) for word in words]
+        return dict(zip(["changeCount", "changeTime", "modificationTime",
+                         "accessCount", "accessTime"], result))
 
-        return words
+    def fetchStats(self, days: int=DEFAULT_STATS_DAYS) -> dict:
+        """ Read the counters kept by the stats triggers
+
+        Returns the total number of words, meanings and sentences, the change
+        validators, and the number of each added per UTC day over the last
+        `days` days. Days without additions are left out, and deletes do not
+        change past days.
+        """
+
+        today = int(datetime.datetime.utcnow().timestamp()) // SECONDS_PER_DAY
+
+        self.openDatabase()
+
+        self._dbCurs.execute(SQL_FETCH_STATS)
+        result = self._dbCurs.fetchone()
+        self._dbCurs.execute(SQL_FETCH_STATS_DAYS, (today - days + 1,))
+        results = self._dbCurs.fetchall()
+
+        self.closeDatabase()
+
+        stats = dict(zip(["wordCount", "meaningCount", "sentenceCount",
+                          "changeCount", "changeTime"], result))
+
+        keys = ["wordCount", "meaningCount", "sentenceCount"]
+        stats["days"] = [
+            dict(zip(keys, counts),
+                 date=datetime.date.fromordinal(EPOCH_ORDINAL + day)
+                      .isoformat())
+            for day, *counts in results
+        ]
+
+        return stats
 
     def fetchWordById(self, wordId: int) -> dict:
         response = {
@@ -231,6 +2736,14 @@ class Connection(object):
             "accessTime": None,
         }
 
+        key = ("fetchWordById", wordId)
+        cached = self.cacheGet(key)
+        if cached is not None:
+            self.recordAccess([wordId])
+            return cached
+
+        generation = self.cacheGeneration()
+
         self.openDatabase()
 
         self._dbCurs.execute(SQL_FETCH_WORD_BY_WORD_ID, (wordId,))
@@ -243,36 +2756,228 @@ class Connection(object):
 
         self.closeDatabase()
 
+        if result is not None:
+            self.cachePut(key, response, wordTags(wordId, result[1]),
+                          generation)
+            self.recordAccess([wordId])
+
         return response
 
     def deleteWordById(self, wordId: int):
-        self.openDatabase()
+        if self._writer is not None:
+            future = self._writer.submit(SQL_DELETE_WORD_BY_WORD_ID, (wordId,))
+            result = future.result()
+        else:
+            def delete():
+                self.openDatabase()
 
-        self._dbCurs.execute(SQL_DELETE_WORD_BY_WORD_ID, (wordId,))
-        self._dbCurs.execute(SQL_COMMIT)
+                try:
+                    self._dbCurs.execute("BEGIN IMMEDIATE TRANSACTION;")
+                    self._dbCurs.execute(SQL_DELETE_WORD_BY_WORD_ID, (wordId,))
+                    result = self._dbCurs.fetchone()
+                    self._dbCurs.execute(SQL_COMMIT)
 
-        self.closeDatabase()
+                finally:
+                    self.closeDatabase()
+
+                return result
+
+            result = self._pool.retry(delete)
+
+        if result is not None:
+            self.cacheInvalidate(changedWordTags(wordId, result[0]))
 
     def fetchWords(self, max: int=10, sortByTime: bool=False) -> list:
+        sort = "access" if sortByTime else "text"
+        order = "asc" if sortByTime else "desc"
+
+        page = self.fetchWordsPage(max, sort, order)
+
+        return page["words"]
+
+    def fetchWordsPage(self, max: int=10, sort: str="access",
+                       order: str="asc", after: str | None=None) -> dict:
+        """ Fetch one page of words in a stable order
+
+        `after` is the `next` cursor of the previous page. The returned
+        `next` is None when there are no more words.
+        """
+
+        # A negative LIMIT would not limit at all
+        if max < 0:
+            raise ValueError(f"max must not be negative: {max}")
+
+        column = sortColumn(sort)
+        orderSnip = orderClause(sort, order)
+
+        if after is None:
+            sql = SQL_FETCH_WORDS.format(column=column, order=orderSnip)
+            params = (max + 1,)
+        else:
+            sortValue, wordId = decodeCursor(after)
+            comparison = ">" if order == "asc" else "<"
+            sql = SQL_FETCH_WORDS_AFTER.format(column=column, order=orderSnip,
+                                               comparison=comparison)
+            params = (sortValue, wordId, max + 1)
+
+        # Fetching max + 1 rows to find the next page would return one row
+        if max == 0:
+            return {"words": [], "next": None}
+
+        key = ("fetchWordsPage", max, sort, order, after)
+        page = self.cacheGet(key)
+        if page is not None:
+            return page
+
+        generation = self.cacheGeneration()
+
         self.openDatabase()
 
-        sortStmtSnip = "accessTime ASC" if sortByTime else "wordText DESC"
+        self._dbCurs.execute(sql, params)
+        rows = self._dbCurs.fetchall()
 
-        self._dbCurs.execute(SQL_FETCH_WORDS, (sortStmtSnip, max))
-        words = self._dbCurs.fetchall()
+        self.closeDatabase()
+
+        next = None
+        if max > 0 and len(rows) > max:
+            rows = rows[:max]
+            next = encodeCursor(rows[-1][2], rows[-1][0])
+
+        words = [dict(zip(["wordId", "wordText"], row)) for row in rows]
+
+        page = {"words": words, "next": next}
+
+        tags = [("words",)]
+        if column == "accessTime":
+            tags.append(ACCESS_ORDER_TAG)
+
+        self.cachePut(key, page, tags, generation)
+
+        return page
+
+    def iterWords(self, sort: str="access", order: str="asc",
+                  after: str | None=None, max: int | None=None,
+                  chunkSize: int=DEFAULT_STREAM_CHUNK):
+        """ Yield lists of up to `chunkSize` words in a stable order
+
+        Every chunk is one keyset query on a connection that is released
+        before the chunk is yielded, so memory use does not grow with the
+        number of words, and a slow client never holds a pooled connection
+        that other requests and the writer threads are waiting for. Like
+        paging with `fetchWordsPage`, the export is not one snapshot: a
+        word whose sort value changes meanwhile can be missed or repeated.
+        """
+
+        if max is not None and max < 0:
+            raise ValueError(f"max must not be negative: {max}")
+
+        column = sortColumn(sort)
+        orderSnip = orderClause(sort, order)
+        comparison = ">" if order == "asc" else "<"
+        remaining = max
+
+        position = None if after is None else decodeCursor(after)
+
+        while remaining != 0:
+            limit = chunkSize if remaining is None else min(chunkSize,
+                                                            remaining)
+            if position is None:
+                sql = SQL_FETCH_WORDS.format(column=column, order=orderSnip)
+                params = (limit,)
+            else:
+                sql = SQL_FETCH_WORDS_AFTER.format(column=column,
+                                                   order=orderSnip,
+                                                   comparison=comparison)
+                params = position + (limit,)
+
+            dbConn = self._pool.acquire()
+            try:
+                rows = dbConn.execute(sql, params).fetchall()
+            finally:
+                self._pool.release(dbConn)
+
+            if rows:
+                yield [dict(zip(["wordId", "wordText"], row[:2]))
+                       for row in rows]
+
+            if len(rows) < limit:
+                break
+
+            position = (rows[-1][2], rows[-1][0])
+            if remaining is not None:
+                remaining -= len(rows)
+
+    def fetchWordDetail(self, word: int | str) -> dict:
+        """ Fetch a word by id or text with all its meanings and sentences
+
+        The whole card is assembled by one query. Like `fetchWordById`, an
+        unknown word yields None fields and no meanings.
+        """
+
+        if isinstance(word, int):
+            condition = "wordTable.wordId = ?"
+            response = {"wordId": word, "wordText": None}
+        else:
+            condition = "wordTable.wordText = ?"
+            response = {"wordId": None, "wordText": word}
+
+        response.update({
+            "creationTime": None,
+            "modificationTime": None,
+            "accessTime": None,
+            "meanings": [],
+        })
+
+        key = ("fetchWordDetail", word)
+        cached = self.cacheGet(key)
+        if cached is not None:
+            self.recordAccess([cached["wordId"]])
+            return cached
+
+        generation = self.cacheGeneration()
+
+        self.openDatabase()
+
+        self._dbCurs.execute(SQL_FETCH_WORD_DETAIL.format(condition=condition),
+                             (word,))
+        result = self._dbCurs.fetchone()
 
         self.closeDatabase()
 
-        words = [dict(zip(["wordId", "wordText"], word)) for word in words]
+        if result is not None:
+            response = json.loads(result[0])
+            self.cachePut(key, response,
+                          wordTags(response["wordId"], response["wordText"]),
+                          generation)
+            self.recordAccess([response["wordId"]])
 
-        return words
+        return response
 
-    def fetchWordDetail(self, word: int | str) -> list:
-        pass
+    def fetchWordsDetail(self, wordIds: list) -> list:
+        """ Fetch many words with their meanings and sentences in one query
 
-    def insertWord(self, word: dict):
-        timestamp = int(datetime.datetime.utcnow().timestamp())
+        Words are returned in the order of `wordIds`; unknown ids are left
+        out.
+        """
+
+        condition = "wordTable.wordId IN (SELECT value FROM json_each(?))"
+
+        self.openDatabase()
+
+        self._dbCurs.execute(SQL_FETCH_WORD_DETAIL.format(condition=condition),
+                             (json.dumps(wordIds),))
+        results = self._dbCurs.fetchall()
+
+        self.closeDatabase()
 
+        words = {}
+        for result in results:
+            word = json.loads(result[0])
+            words[word["wordId"]] = word
+
+        return [words[wordId] for wordId in wordIds if wordId in words]
+
+    def prepareWord(self, word: dict, timestamp: int) -> tuple:
         wordText = word["wordText"]
 
         if not "creationTime" in word:
@@ -290,22 +2995,41 @@ class Connection(object):
         else:
             accessTime = word["accessTime"]
 
-        self.openDatabase()
+        return (wordText, creationTime, modificationTime, accessTime)
 
-        try:
-            self._dbCurs.execute("BEGIN DEFERRED TRANSACTION;")
+    def insertWord(self, word: dict):
+        timestamp = int(datetime.datetime.utcnow().timestamp())
 
-            self._dbCurs.execute(SQL_INSERT_WORD,
-                (wordText, creationTime, modificationTime, accessTime))
+        params = self.prepareWord(word, timestamp)
+        wordText, creationTime, modificationTime, accessTime = params
 
-            self._dbCurs.execute("END TRANSACTION;")
+        if self._writer is not None:
+            result = self._writer.submit(SQL_INSERT_WORD, params).result()
+            wordId = result[0] if result is not None else None
+        else:
+            def insert():
+                self.openDatabase()
 
-            wordId = self._dbCurs.lastrowid
+                try:
+                    self._dbCurs.execute("BEGIN IMMEDIATE TRANSACTION;")
 
-        except sqlite3.IntegrityError as e:
-            wordId = None
+                    self._dbCurs.execute(SQL_INSERT_WORD, params)
+                    wordId = self._dbCurs.fetchone()[0]
 
-        self.closeDatabase()
+                    self._dbCurs.execute("END TRANSACTION;")
+
+                except sqlite3.IntegrityError as e:
+                    wordId = None
+
+                finally:
+                    self.closeDatabase()
+
+                return wordId
+
+            wordId = self._pool.retry(insert)
+
+        if wordId is not None:
+            self.cacheInvalidate(changedWordTags(wordId, wordText))
 
         response = {
             "wordId": wordId,
@@ -317,60 +3041,228 @@ class Connection(object):
 
         return response
 
-    def insertWordDetail(self, words: list):
+    @retriedOnLock
+    def insertWords(self, words: list) -> list:
+        """ Insert many words in one transaction
+
+        Every item gets a `status`: "created", "conflict" when the word
+        already exists, or "invalid" when it has no usable wordText.
+        """
+
         timestamp = int(datetime.datetime.utcnow().timestamp())
+        responses = []
+        changedTags = []
 
         self.openDatabase()
 
         try:
-            self._dbCurs.execute("BEGIN DEFERRED TRANSACTION;")
+            self._dbCurs.execute("BEGIN IMMEDIATE TRANSACTION;")
 
-            # Insert words
             for word in words:
-                wordText = word["text"]
-                wordMeanings = word["meanings"]
+                if (not isinstance(word, dict)
+                        or not isinstance(word.get("wordText"), str)
+                        or not word["wordText"]):
+                    responses.append({"wordId": None, "status": "invalid"})
+                    continue
+
+                params = self.prepareWord(word, timestamp)
+                response = dict(zip(["wordId", "wordText", "creationTime",
+                                     "modificationTime", "accessTime"],
+                                    (None,) + params))
+
+                self._dbCurs.execute("SAVEPOINT word;")
+                try:
+                    self._dbCurs.execute(SQL_INSERT_WORD, params)
+                    response["wordId"] = self._dbCurs.fetchone()[0]
+                    response["status"] = "created"
+                    changedTags += changedWordTags(response["wordId"],
+                                                   response["wordText"])
+                except sqlite3.IntegrityError:
+                    self._dbCurs.execute("ROLLBACK TO word;")
+                    response["status"] = "conflict"
+                self._dbCurs.execute("RELEASE word;")
+
+                responses.append(response)
+
+            self._dbCurs.execute(SQL_COMMIT)
+
+        finally:
+            self.closeDatabase()
+
+        self.cacheInvalidate(changedTags)
+
+        return responses
+
+    def fetchWordsByIds(self, wordIds: list) -> list:
+        """ Fetch many words by id, in the order of `wordIds`
+
+        Every item gets a `status` of "ok" or "not_found".
+        """
 
-                # Insert word if necessary
-                self._dbCurs.execute(SQL_QUERY_WORD_ID, (wordText,))
+        self.openDatabase()
+
+        self._dbCurs.execute(SQL_FETCH_WORDS_BY_WORD_IDS,
+                             (json.dumps(wordIds),))
+        results = self._dbCurs.fetchall()
+
+        self.closeDatabase()
+
+        keys = ["wordId", "wordText",
+                "creationTime", "modificationTime", "accessTime"]
+        found = {result[0]: dict(zip(keys, result)) for result in results}
+
+        responses = []
+        for wordId in wordIds:
+            if wordId in found:
+                response = dict(found[wordId], status="ok")
+            else:
+                response = {"wordId": wordId, "status": "not_found"}
+            responses.append(response)
+
+        self.recordAccess(list(found))
+
+        return responses
+
+    @retriedOnLock
+    def deleteWordsById(self, wordIds: list) -> list:
+        """ Delete many words in one transaction
+
+        Every item gets a `status` of "deleted" or "not_found".
+        """
+
+        responses = []
+        changedTags = []
+
+        self.openDatabase()
+
+        try:
+            self._dbCurs.execute("BEGIN IMMEDIATE TRANSACTION;")
+
+            for wordId in wordIds:
+                self._dbCurs.execute(SQL_DELETE_WORD_BY_WORD_ID, (wordId,))
                 result = self._dbCurs.fetchone()
                 if result is not None:
-                    wordId = result[0]
+                    responses.append({"wordId": wordId, "status": "deleted"})
+                    changedTags += changedWordTags(wordId, result[0])
                 else:
-                    self._dbCurs.execute(SQL_INSERT_WORD,
-                                         (wordText, timestamp,
-                                          timestamp, timestamp))
-                    wordId = self._dbCurs.lastrowid
-
-                # Insert word meanings
-                for wordMeaning in wordMeanings:
-                    meaningText = wordMeaning["text"]
-                    meaningSentences = wordMeaning["sentences"]
-
-                    # Insert meaning if necessary
-                    self._dbCurs.execute(SQL_QUERY_MEANING_ID, (meaningText,))
-                    result = self._dbCurs.fetchone()
-                    if result is not None:
-                        meaningId = result[0]
-                    else:
-                        self._dbCurs.execute(SQL_INSERT_MEANING,
-                                             (wordId, meaningText,
-                                              timestamp, timestamp, timestamp))
-                        meaningId = self._dbCurs.lastrowid
-
-                    for meaningSentence in meaningSentences:
-
-                        # Insert sentence if necessary
-                        self._dbCurs.execute(SQL_QUERY_SENTENCE_ID,
-                                             (meaningSentence,))
-                        result = self._dbCurs.fetchone()
-                        if result is None:
-                            self._dbCurs.execute(SQL_INSERT_SENTENCE,
-                                                 (meaningId, meaningSentence,
-                                                  timestamp, timestamp, timestamp))
-
-            self._dbCurs.execute("END TRANSACTION;")
-
-        except sqlite3.IntegrityError as e:
-            pass
+                    responses.append({"wordId": wordId, "status": "not_found"})
 
-        self.closeDatabase()
+            self._dbCurs.execute(SQL_COMMIT)
+
+        finally:
+            self.closeDatabase()
+
+        self.cacheInvalidate(changedTags)
+
+        return responses
+
+    def insertWordDetail(self, words: list, batchSize: int=DEFAULT_BATCH_SIZE,
+                         atomic: bool=True, onBatch=None) -> list:
+        """ Insert word, meaning, and sentence records in bulk
+
+        Existing words, meanings and sentences are kept as they are. With
+        `atomic` the whole input is one transaction, otherwise every batch of
+        `batchSize` records is committed on its own. `onBatch` is called with
+        the report of every committed batch, and all reports are returned.
+        """
+
+        reports = []
+
+        self.openDatabase()
+
+        try:
+            self._dbCurs.execute(SQL_CREATE_STAGE_WORD_TABLE)
+            self._dbCurs.execute(SQL_CREATE_STAGE_MEANING_TABLE)
+
+            if atomic:
+                self._dbCurs.execute("BEGIN IMMEDIATE TRANSACTION;")
+
+            records = iter(words)
+            batchIndex = 0
+            changedTags = []
+            while True:
+                batch = list(itertools.islice(records, batchSize))
+                if not batch:
+                    break
+
+                if not atomic:
+                    self._dbCurs.execute("BEGIN IMMEDIATE TRANSACTION;")
+
+                report = self.insertBatch(batch)
+                report["batch"] = batchIndex
+                batchIndex += 1
+
+                if self._cache is not None:
+                    for word in batch:
+                        changedTags += changedWordTags(None, word["text"])
+
+                if not atomic:
+                    self._dbCurs.execute("END TRANSACTION;")
+                    self.cacheInvalidate(changedTags)
+                    changedTags = []
+                    if onBatch is not None:
+                        onBatch(report)
+
+                reports.append(report)
+
+            if atomic:
+                self._dbCurs.execute("END TRANSACTION;")
+                self.cacheInvalidate(changedTags)
+                if onBatch is not None:
+                    for report in reports:
+                        onBatch(report)
+
+        finally:
+            self.closeDatabase()
+
+        return reports
+
+    def insertBatch(self, batch: list) -> dict:
+        startTime = time.perf_counter()
+        timestamp = int(datetime.datetime.utcnow().timestamp())
+        times = (timestamp, timestamp, timestamp)
+
+        self._dbCurs.execute(SQL_CLEAR_STAGE_WORD_TABLE)
+        self._dbCurs.execute(SQL_CLEAR_STAGE_MEANING_TABLE)
+
+        self._dbCurs.executemany(SQL_STAGE_WORD,
+                                 ((word["text"],) for word in batch))
+        self._dbCurs.executemany(SQL_STAGE_MEANING,
+                                 ((word["text"], meaning["text"])
+                                  for word in batch
+                                  for meaning in word["meanings"]))
+
+        # Insert missing words and meanings, then resolve meaning ids. The
+        # counts come from rowcount, which unlike total_changes leaves out
+        # rows written by triggers.
+        self._dbCurs.execute(SQL_BULK_INSERT_WORD, times)
+        wordCount = self._dbCurs.rowcount
+
+        self._dbCurs.execute(SQL_BULK_INSERT_MEANING, times)
+        meaningCount = self._dbCurs.rowcount
+
+        self._dbCurs.execute(SQL_BULK_RESOLVE_MEANING_ID)
+        meaningIds = {(wordText, meaningText): meaningId
+                      for wordText, meaningText, meaningId
+                      in self._dbCurs.fetchall()}
+
+        self._dbCurs.executemany(SQL_BULK_INSERT_SENTENCE,
+                                 ((meaningIds[(word["text"], meaning["text"])],
+                                   sentence) + times
+                                  for word in batch
+                                  for meaning in word["meanings"]
+                                  for sentence in meaning["sentences"]))
+        sentenceCount = self._dbCurs.rowcount
+
+        elapsed = time.perf_counter() - startTime
+
+        report = {
+            "records": len(batch),
+            "words": wordCount,
+            "meanings": meaningCount,
+            "sentences": sentenceCount,
+            "seconds": elapsed,
+            "recordsPerSecond": len(batch) / elapsed if elapsed > 0 else None,
+        }
+
+        return report
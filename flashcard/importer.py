@@ -0,0 +1,218 @@
+""" Stream a dictionary dump into the flashcard database
+
+Usage:
+
+    python -m flashcard.importer DB_PATH DUMP_PATH [--format json|ndjson]
+                                 [--batch-size N] [--checkpoint PATH]
+
+DUMP_PATH holds word records in the shape accepted by
+`Connection.insertWordDetail`, either as one JSON array or as NDJSON with one
+record per line. Records are parsed incrementally and inserted in batches, so
+memory use does not depend on the size of the dump; a record larger than
+MAX_RECORD_SIZE fails the import. With --checkpoint the byte offset of the
+last committed record is saved after every batch, and a later run with the
+same checkpoint seeks there and resumes.
+"""
+
+from . import database
+import argparse
+import codecs
+import collections
+import json
+import os
+import sys
+import time
+
+READ_CHUNK_SIZE = 1 << 20
+
+MAX_RECORD_SIZE = 16 << 20
+
+def iterNdjson(dumpFile, offset: int=0):
+    """ Yield (record, endOffset) for every line of a binary NDJSON file """
+
+    dumpFile.seek(offset)
+
+    while True:
+        line = dumpFile.readline(MAX_RECORD_SIZE + 1)
+        if not line:
+            return
+        if len(line) > MAX_RECORD_SIZE:
+            raise ValueError(f"record at byte {offset} is larger than "
+                             f"{MAX_RECORD_SIZE} bytes")
+
+        offset += len(line)
+        line = line.strip()
+        if not line:
+            continue
+
+        yield json.loads(line), offset
+
+def iterJsonArray(dumpFile, offset: int=0):
+    """ Yield (record, endOffset) for every element of a binary JSON array file
+
+    A non-zero `offset` must be the end offset of a record yielded before.
+    """
+
+    decoder = json.JSONDecoder()
+    textDecoder = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    position = 0
+    eof = False
+    started = offset > 0
+
+    dumpFile.seek(offset)
+
+    def fill() -> bool:
+        nonlocal buffer, position, eof
+        chunk = dumpFile.read(READ_CHUNK_SIZE)
+        if not chunk:
+            eof = True
+            buffer = buffer[position:] + textDecoder.decode(b"", final=True)
+        else:
+            buffer = buffer[position:] + textDecoder.decode(chunk)
+        position = 0
+        return not eof
+
+    def advance(end: int):
+        """ Move past buffer[position:end], counting its encoded bytes """
+
+        nonlocal position, offset
+        offset += len(buffer[position:end].encode("utf-8"))
+        position = end
+
+    def skipSpace() -> str | None:
+        while True:
+            end = position
+            while end < len(buffer) and buffer[end].isspace():
+                end += 1
+            advance(end)
+            if position < len(buffer):
+                return buffer[position]
+            if not fill():
+                return None
+
+    if not started:
+        if skipSpace() != "[":
+            raise ValueError("expected a JSON array")
+        advance(position + 1)
+
+    while True:
+        char = skipSpace()
+        if char is None:
+            raise ValueError("unterminated JSON array")
+        if char == "]":
+            return
+        if started:
+            if char != ",":
+                raise ValueError(f"expected ',' in JSON array, got {char!r}")
+            advance(position + 1)
+            skipSpace()
+
+        while True:
+            try:
+                record, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                end = None
+
+            # A number may be cut in the middle of a chunk
+            if end is not None and (end < len(buffer) or eof):
+                break
+
+            # A malformed record would otherwise be buffered up to the end
+            if len(buffer) - position > MAX_RECORD_SIZE:
+                raise ValueError(f"record at byte {offset} is larger than "
+                                 f"{MAX_RECORD_SIZE} characters")
+            fill()
+
+        advance(end)
+        started = True
+
+        yield record, offset
+
+def loadCheckpoint(path: str | None) -> dict:
+    if path is None or not os.path.isfile(path):
+        return {"records": 0, "offset": 0}
+
+    with open(path, "r") as checkpointFile:
+        return json.load(checkpointFile)
+
+def saveCheckpoint(path: str | None, checkpoint: dict):
+    if path is None:
+        return
+
+    tempPath = path + ".tmp"
+    with open(tempPath, "w") as checkpointFile:
+        json.dump(checkpoint, checkpointFile)
+    os.replace(tempPath, path)
+
+def importDump(dbPath: str, dumpPath: str, format: str="ndjson",
+               batchSize: int=database.DEFAULT_BATCH_SIZE,
+               checkpointPath: str | None=None, log=sys.stderr) -> dict:
+    checkpoint = loadCheckpoint(checkpointPath)
+    pending = collections.deque()
+    startTime = time.perf_counter()
+
+    def onBatch(report: dict):
+        for _ in range(report["records"]):
+            checkpoint["offset"] = pending.popleft()
+
+        checkpoint["records"] += report["records"]
+        saveCheckpoint(checkpointPath, checkpoint)
+
+        elapsed = time.perf_counter() - startTime
+        print(f"batch {report['batch']}: "
+              f"{checkpoint['records']} records, "
+              f"{report['words']} words, "
+              f"{report['meanings']} meanings, "
+              f"{report['sentences']} sentences, "
+              f"{report['recordsPerSecond'] or 0:.0f} records/s "
+              f"({elapsed:.1f}s elapsed)", file=log)
+
+    with open(dumpPath, "rb") as dumpFile:
+        if format == "ndjson":
+            records = iterNdjson(dumpFile, checkpoint["offset"])
+        elif format == "json":
+            records = iterJsonArray(dumpFile, checkpoint["offset"])
+        else:
+            raise ValueError(f"unknown dump format: {format}")
+
+        def track():
+            for record, offset in records:
+                pending.append(offset)
+                yield record
+
+        dbConn = database.Connection(dbPath)
+        dbConn.insertWordDetail(track(), batchSize=batchSize,
+                                atomic=False, onBatch=onBatch)
+
+    return checkpoint
+
+def main(argv: list | None=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m flashcard.importer",
+        description="Stream a JSON or NDJSON dictionary dump into a database")
+    parser.add_argument("dbPath")
+    parser.add_argument("dumpPath")
+    parser.add_argument("--format", choices=["json", "ndjson"], default=None,
+                        help="dump format, guessed from the extension if "
+                             "omitted")
+    parser.add_argument("--batch-size", type=int,
+                        default=database.DEFAULT_BATCH_SIZE)
+    parser.add_argument("--checkpoint", default=None,
+                        help="file recording the last committed position")
+    args = parser.parse_args(argv)
+
+    format = args.format
+    if format is None:
+        format = "json" if args.dumpPath.endswith(".json") else "ndjson"
+
+    checkpoint = importDump(args.dbPath, args.dumpPath, format,
+                            args.batch_size, args.checkpoint)
+
+    print(f"imported {checkpoint['records']} records", file=sys.stderr)
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
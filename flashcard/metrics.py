@@ -0,0 +1,180 @@
+""" Opt-in counters and latency histograms in the Prometheus text format
+
+A `Metrics` registry is shared by the connection pool, which times every
+statement and connection checkout, and by the app, which times requests and
+serves the registry at /metrics. Every update takes one lock and a handful
+of arithmetic operations, so the registry can stay on in production.
+"""
+
+import bisect
+import threading
+
+# Upper bounds in seconds, from 50 microseconds to 10 seconds
+DEFAULT_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+                   0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+DEFAULT_SLOW_QUERY = 0.1
+
+HELP = {
+    "flashcard_statement_seconds":
+        "Time to execute an SQL statement, by statement",
+    "flashcard_fetch_seconds":
+        "Time to fetch the result rows of an SQL statement, by statement",
+    "flashcard_rows_returned_total":
+        "Rows fetched from SQL statements, by statement",
+    "flashcard_rows_written_total":
+        "Rows inserted, updated or deleted by SQL statements, by statement",
+    "flashcard_slow_statements_total":
+        "SQL statements slower than the slow query threshold",
+    "flashcard_lock_errors_total":
+        "SQL statements that failed because the database was locked",
+    "flashcard_lock_retries_total":
+        "Write transactions run again because the database was locked",
+    "flashcard_pool_acquire_seconds":
+        "Time to check a connection out of the pool",
+    "flashcard_request_seconds":
+        "Time to handle an HTTP request, by route, method and status",
+    "flashcard_cache_hits_total": "Word cache lookups that found an entry",
+    "flashcard_cache_misses_total": "Word cache lookups that found nothing",
+    "flashcard_cache_evictions_total": "Word cache entries evicted for space",
+    "flashcard_cache_invalidations_total":
+        "Word cache entries dropped because their words changed",
+    "flashcard_cache_entries": "Entries in the word cache",
+    "flashcard_cache_bytes": "Bytes held by the word cache",
+}
+
+class Histogram(object):
+    """ Cumulative bucket counts, sum and count of observed values """
+
+    def __init__(self, buckets: tuple) -> None:
+        self._buckets = buckets
+        self._counts = [0] * len(buckets)
+        self._sum = 0.0
+        self._count = 0
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self._buckets, value)
+        if index < len(self._counts):
+            self._counts[index] += 1
+        self._sum += value
+        self._count += 1
+
+    def samples(self) -> list:
+        """ Return (suffix, extraLabels, value) in exposition order """
+
+        samples = []
+        cumulative = 0
+        for bound, count in zip(self._buckets, self._counts):
+            cumulative += count
+            samples.append(("_bucket", (("le", repr(bound)),), cumulative))
+        samples.append(("_bucket", (("le", "+Inf"),), self._count))
+        samples.append(("_sum", (), self._sum))
+        samples.append(("_count", (), self._count))
+
+        return samples
+
+def escapeLabel(value: str) -> str:
+    return (str(value).replace("\\", "\\\\").replace("\"", "\\\"")
+            .replace("\n", "\\n"))
+
+def formatLabels(labels: tuple) -> str:
+    if not labels:
+        return ""
+
+    pairs = ",".join(f"{name}=\"{escapeLabel(value)}\""
+                     for name, value in labels)
+    return "{" + pairs + "}"
+
+class Metrics(object):
+    """ A thread-safe registry of counters and histograms
+
+    Labels are tuples of (name, value) pairs. Collectors are called at
+    render time and return (name, type, labels, value) samples, for values
+    that are cheaper to read than to track, such as the cache statistics.
+    """
+
+    def __init__(self, buckets: tuple=DEFAULT_BUCKETS,
+                 slowQuery: float=DEFAULT_SLOW_QUERY) -> None:
+        self._buckets = tuple(buckets)
+        self._slowQuery = slowQuery
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._collectors = []
+
+    @property
+    def slowQuery(self) -> float:
+        return self._slowQuery
+
+    def increment(self, name: str, labels: tuple=(), value: float=1):
+        key = (name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def total(self, name: str) -> float:
+        """ Return the sum of a counter over all its labels """
+
+        with self._lock:
+            return sum(value for (counter, labels), value
+                       in self._counters.items() if counter == name)
+
+    def observe(self, name: str, labels: tuple, value: float):
+        key = (name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = Histogram(self._buckets)
+                self._histograms[key] = histogram
+            histogram.observe(value)
+
+    def addCollector(self, collector):
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        """ Return every metric in the Prometheus text exposition format """
+
+        families = {}
+
+        with self._lock:
+            for (name, labels), value in self._counters.items():
+                families.setdefault((name, "counter"), []).append(
+                    (name, labels, value))
+
+            for (name, labels), histogram in self._histograms.items():
+                samples = families.setdefault((name, "histogram"), [])
+                for suffix, extraLabels, value in histogram.samples():
+                    samples.append((name + suffix, labels + extraLabels,
+                                    value))
+
+        for collector in self._collectors:
+            for name, type, labels, value in collector():
+                families.setdefault((name, type), []).append(
+                    (name, labels, value))
+
+        lines = []
+        for (name, type), samples in sorted(families.items()):
+            if name in HELP:
+                lines.append(f"# HELP {name} {HELP[name]}")
+            lines.append(f"# TYPE {name} {type}")
+            for sampleName, labels, value in samples:
+                lines.append(f"{sampleName}{formatLabels(labels)} {value}")
+
+        return "\n".join(lines) + "\n"
+
+def cacheCollector(cache):
+    """ Report the statistics of a `database.WordCache` """
+
+    def collect() -> list:
+        stats = cache.stats()
+        return [
+            ("flashcard_cache_hits_total", "counter", (), stats["hits"]),
+            ("flashcard_cache_misses_total", "counter", (), stats["misses"]),
+            ("flashcard_cache_evictions_total", "counter", (),
+             stats["evictions"]),
+            ("flashcard_cache_invalidations_total", "counter", (),
+             stats["invalidations"]),
+            ("flashcard_cache_entries", "gauge", (), stats["entries"]),
+            ("flashcard_cache_bytes", "gauge", (), stats["bytes"]),
+        ]
+
+    return collect
@@ -0,0 +1,207 @@
+""" Versioned schema migrations
+
+The schema version of a database is kept in `PRAGMA user_version`. Every
+migration runs in its own write transaction and bumps the version, so a
+database is upgraded exactly once, by whichever process gets there first.
+Databases written by the legacy `main.DbConn` (version 0, no timestamp
+columns) are upgraded in place.
+"""
+
+from . import database
+import datetime
+import sqlite3
+
+BACKFILL_BATCH_SIZE = 10000
+
+SQL_TABLE_COLUMNS = """
+    SELECT name FROM pragma_table_info(?);
+    """
+
+SQL_ADD_TIMESTAMP_COLUMN = """
+    ALTER TABLE {table} ADD COLUMN {column} INTEGER NOT NULL DEFAULT 0;
+    """
+
+SQL_BACKFILL_BATCH_END = """
+    SELECT max(rowid) FROM (SELECT rowid FROM {table}
+                                WHERE rowid > ?
+                                ORDER BY rowid
+                                LIMIT ?);
+    """
+
+SQL_BACKFILL_TIMESTAMPS = """
+    UPDATE {table}
+        SET creationTime = ?, modificationTime = ?, accessTime = ?
+        WHERE rowid > ? AND rowid <= ?
+          AND creationTime = 0;
+    """
+
+TIMESTAMP_COLUMNS = ("creationTime", "modificationTime", "accessTime")
+
+def executeScript(dbConn: sqlite3.Connection, script: str):
+    """ Run every statement of `script` inside the current transaction
+
+    Unlike `executescript`, this does not commit first.
+    """
+
+    statement = ""
+    for line in script.splitlines(keepends=True):
+        statement += line
+        if sqlite3.complete_statement(statement):
+            dbConn.execute(statement)
+            statement = ""
+
+    if statement.strip():
+        dbConn.execute(statement)
+
+def createBaseTables(dbConn: sqlite3.Connection):
+    dbConn.execute(database.SQL_CREATE_WORD_TABLE)
+    dbConn.execute(database.SQL_CREATE_MEANING_TABLE)
+    dbConn.execute(database.SQL_CREATE_SENTENCE_TABLE)
+
+    # Legacy DbConn tables have no timestamp columns
+    for table in ("wordTable", "meaningTable", "sentenceTable"):
+        columns = {row[0] for row in
+                   dbConn.execute(SQL_TABLE_COLUMNS, (table,)).fetchall()}
+        for column in TIMESTAMP_COLUMNS:
+            if column not in columns:
+                dbConn.execute(SQL_ADD_TIMESTAMP_COLUMN.format(table=table,
+                                                               column=column))
+
+def backfillTimestamps(dbConn: sqlite3.Connection):
+    """ Stamp rows added by the legacy schema, one batch per transaction
+
+    Batches walk consecutive rowid ranges, so every row is read once
+    however many batches there are.
+    """
+
+    timestamp = int(datetime.datetime.utcnow().timestamp())
+
+    for table in ("wordTable", "meaningTable", "sentenceTable"):
+        endSql = SQL_BACKFILL_BATCH_END.format(table=table)
+        updateSql = SQL_BACKFILL_TIMESTAMPS.format(table=table)
+        lastRowId = 0
+        while True:
+            dbConn.execute("BEGIN IMMEDIATE TRANSACTION;")
+            endRowId = dbConn.execute(endSql, (lastRowId,
+                                               BACKFILL_BATCH_SIZE)
+                                      ).fetchone()[0]
+            if endRowId is not None:
+                dbConn.execute(updateSql, (timestamp, timestamp, timestamp,
+                                           lastRowId, endRowId))
+            dbConn.execute(database.SQL_COMMIT)
+            if endRowId is None:
+                break
+            lastRowId = endRowId
+
+def createReadIndexes(dbConn: sqlite3.Connection):
+    dbConn.execute(database.SQL_CREATE_WORD_CREATION_TIME_INDEX)
+    dbConn.execute(database.SQL_CREATE_WORD_MODIFICATION_TIME_INDEX)
+    dbConn.execute(database.SQL_CREATE_WORD_ACCESS_TIME_INDEX)
+    dbConn.execute(database.SQL_CREATE_WORD_TEXT_LOWER_INDEX)
+    dbConn.execute(database.SQL_CREATE_MEANING_WORD_ID_INDEX)
+    dbConn.execute(database.SQL_CREATE_SENTENCE_MEANING_ID_INDEX)
+
+def createSearchTables(dbConn: sqlite3.Connection):
+    searchTables = (
+        ("wordTrigramTable", database.SQL_CREATE_WORD_TRIGRAM_TABLE,
+         database.SQL_CREATE_WORD_TRIGRAM_TRIGGERS),
+        ("meaningSearchTable", database.SQL_CREATE_MEANING_SEARCH_TABLE,
+         database.SQL_CREATE_MEANING_SEARCH_TRIGGERS),
+        ("sentenceSearchTable", database.SQL_CREATE_SENTENCE_SEARCH_TABLE,
+         database.SQL_CREATE_SENTENCE_SEARCH_TRIGGERS),
+    )
+
+    for table, createSql, triggersSql in searchTables:
+        dbConn.execute(createSql)
+        executeScript(dbConn, triggersSql)
+        dbConn.execute(database.SQL_REBUILD_SEARCH_TABLE.format(table=table))
+
+def createChangeTracking(dbConn: sqlite3.Connection):
+    executeScript(dbConn, database.SQL_CREATE_CHANGE_TABLE)
+    executeScript(dbConn, database.SQL_CREATE_CHANGE_TRIGGERS)
+
+def createSyncTables(dbConn: sqlite3.Connection):
+    executeScript(dbConn, database.SQL_CREATE_TOMBSTONE_TABLE)
+    executeScript(dbConn, database.SQL_CREATE_TOMBSTONE_TRIGGERS)
+
+    # Databases created before versioning may have the columns already
+    for table in database.CHANGE_SEQUENCE_TABLES:
+        columns = {row[0] for row in
+                   dbConn.execute(SQL_TABLE_COLUMNS, (table,)).fetchall()}
+        if "changeSeq" not in columns:
+            sql = database.SQL_ADD_CHANGE_SEQUENCE_COLUMN.format(table=table)
+            dbConn.execute(sql)
+
+    executeScript(dbConn, database.SQL_CREATE_CHANGE_SEQUENCE)
+    executeScript(dbConn, database.SQL_CREATE_CHANGE_SEQUENCE_TRIGGERS)
+
+def createCascades(dbConn: sqlite3.Connection):
+    executeScript(dbConn, database.SQL_CREATE_CASCADE_TRIGGERS)
+
+def createReviewScheduler(dbConn: sqlite3.Connection):
+    executeScript(dbConn, database.SQL_CREATE_REVIEW_TABLES)
+    executeScript(dbConn, database.SQL_CREATE_REVIEW_TRIGGERS)
+
+def createStats(dbConn: sqlite3.Connection):
+    executeScript(dbConn, database.SQL_CREATE_STATS_TABLE)
+    executeScript(dbConn, database.SQL_CREATE_STATS_TRIGGERS)
+
+# (version, description, apply, transactional). Migrations that are not
+# transactional manage their own transactions and must be idempotent.
+MIGRATIONS = [
+    (1, "base tables", createBaseTables, True),
+    (2, "backfill legacy timestamps", backfillTimestamps, False),
+    (3, "read path indexes", createReadIndexes, True),
+    (4, "full-text and trigram search", createSearchTables, True),
+    (5, "change counter", createChangeTracking, True),
+    (6, "sync tombstones and change sequence", createSyncTables, True),
+    (7, "cascading deletes", createCascades, True),
+    (8, "review scheduler", createReviewScheduler, True),
+    (9, "statistics counters", createStats, True),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+def schemaVersion(dbConn: sqlite3.Connection) -> int:
+    return dbConn.execute("PRAGMA user_version;").fetchone()[0]
+
+def migrate(dbConn: sqlite3.Connection) -> list:
+    """ Bring the schema up to `LATEST_VERSION`
+
+    `dbConn` must be in autocommit mode. Returns the versions applied.
+    """
+
+    version = schemaVersion(dbConn)
+    if version > LATEST_VERSION:
+        raise RuntimeError(f"database schema version {version} is newer "
+                           f"than the supported version {LATEST_VERSION}")
+
+    applied = []
+
+    for migrationVersion, description, apply, transactional in MIGRATIONS:
+        if migrationVersion <= version:
+            continue
+
+        if transactional:
+            dbConn.execute("BEGIN IMMEDIATE TRANSACTION;")
+
+            # Another process may have migrated while we waited for the lock
+            if schemaVersion(dbConn) >= migrationVersion:
+                dbConn.execute(database.SQL_COMMIT)
+                continue
+
+            try:
+                apply(dbConn)
+                dbConn.execute(f"PRAGMA user_version = {migrationVersion};")
+                dbConn.execute(database.SQL_COMMIT)
+            except Exception:
+                dbConn.rollback()
+                raise
+        else:
+            apply(dbConn)
+            dbConn.execute(f"PRAGMA user_version = {migrationVersion};")
+
+        applied.append(migrationVersion)
+        version = migrationVersion
+
+    return applied
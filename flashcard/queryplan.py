@@ -0,0 +1,227 @@
+""" Check the query plans of the SQL statements in flashcard.database
+
+Usage:
+
+    python -m flashcard.queryplan [--words N] [--seed N] [--verbose]
+
+Every module-level `SQL_*` statement of `flashcard.database`, and every
+statement in the bodies of its triggers, is run through EXPLAIN QUERY PLAN
+against a freshly migrated database filled with N generated words. Templates
+are expanded with every value the database layer formats them with. A
+statement fails the check when its plan scans a whole table, or a whole index
+without a LIMIT to stop it, or sorts through a temporary B-tree, unless it
+is listed in `EXEMPT` with the reason. The exit status is 1 if any statement
+fails, so the check can gate a release.
+"""
+
+from . import benchmark
+from . import database
+import argparse
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+
+PAT_TRIGGER = re.compile(r"CREATE\s+TRIGGER\s+(?:IF\s+NOT\s+EXISTS\s+)?(\w+)"
+                         r".*?\bBEGIN\b(.*?)\bEND;", re.DOTALL | re.IGNORECASE)
+
+PAT_ROW_REFERENCE = re.compile(r"\b(?:new|old)\.\w+")
+
+PAT_TEMP_SORT = re.compile(r"USE TEMP B-TREE")
+
+PAT_TABLE_SCAN = re.compile(r"^SCAN (?:\w+\.)?(\w+)"
+                            r"( USING (?:COVERING )?INDEX \w+)?$")
+
+PAT_LIMIT = re.compile(r"\bLIMIT\b", re.IGNORECASE)
+
+PAT_TABLE_ALIAS = re.compile(r"(?:\w+\.)?(\w+)\s+AS\s+(\w+)", re.IGNORECASE)
+
+# Tables that a scan cannot hurt: single-row counters, and per-batch staging
+SMALL_TABLES = {"changeTable", "statsTable",
+                "stageWordTable", "stageMeaningTable"}
+
+# Statements that scan or sort by design, with the reason
+EXEMPT = {
+    "SQL_FUZZY_SEARCH_WORD_BY_TIME": "no index orders one prefix range by "
+                                     "a time column; searches sorted by "
+                                     "text use SQL_FUZZY_SEARCH_WORD",
+    "SQL_SEARCH_TEXT": "ranks full-text matches by BM25, which no index "
+                       "can serve; only the matches are sorted",
+    "SQL_COUNT_SENTENCES": "counts every sentence for compaction reports",
+    "SQL_DELETE_ORPHAN_MEANINGS": "one-off compaction sweep",
+    "SQL_DELETE_ORPHAN_SENTENCES": "one-off compaction sweep",
+    "SQL_REBUILD_SEARCH_TABLE": "rebuilds the whole search index",
+    "SQL_OPTIMIZE_SEARCH_TABLE": "merges the whole search index",
+}
+
+SEARCH_TABLES = ("wordTrigramTable", "meaningSearchTable",
+                 "sentenceSearchTable")
+
+DETAIL_CONDITIONS = ("wordTable.wordId = ?", "wordTable.wordText = ?",
+                     "wordTable.wordId IN (SELECT value FROM json_each(?))")
+
+def templateValues() -> dict:
+    """ Map every template statement to the format values it is used with """
+
+    orders = []
+    for sort in database.SORT_COLUMNS:
+        for order in database.SORT_ORDERS:
+            orders.append({
+                "column": database.sortColumn(sort),
+                "order": database.orderClause(sort, order),
+                "comparison": ">" if order == "asc" else "<",
+            })
+    timeOrders = [values for values in orders
+                  if values["column"] != "wordText"]
+
+    return {
+        "SQL_FETCH_WORDS": orders,
+        "SQL_FETCH_WORDS_AFTER": orders,
+        "SQL_FUZZY_SEARCH_WORD": [{"direction": order.upper()}
+                                  for order in database.SORT_ORDERS],
+        "SQL_FUZZY_SEARCH_WORD_BY_TIME": timeOrders,
+        "SQL_FETCH_WORD_DETAIL": [{"condition": condition}
+                                  for condition in DETAIL_CONDITIONS],
+        "SQL_SAMPLE_WORDS": [{"condition": condition} for condition
+                             in database.SAMPLE_FILTERS.values()],
+        "SQL_SAMPLE_NEXT_WORDS": [{"condition": condition} for condition
+                                  in database.SAMPLE_FILTERS.values()],
+        "SQL_REBUILD_SEARCH_TABLE": [{"table": table}
+                                     for table in SEARCH_TABLES],
+        "SQL_OPTIMIZE_SEARCH_TABLE": [{"table": table}
+                                      for table in SEARCH_TABLES],
+    }
+
+def splitStatements(script: str) -> list:
+    statements = []
+    statement = ""
+    for line in script.splitlines(keepends=True):
+        statement += line
+        if sqlite3.complete_statement(statement):
+            statements.append(statement.strip())
+            statement = ""
+
+    if statement.strip():
+        statements.append(statement.strip())
+
+    return statements
+
+def iterStatements():
+    """ Yield (name, exemptName, sql) for every statement worth planning
+
+    Schema scripts contribute the statements in their trigger bodies, with
+    the `new.` and `old.` row references turned into parameters.
+    """
+
+    values = templateValues()
+
+    for name in sorted(dir(database)):
+        if not name.startswith("SQL_"):
+            continue
+        script = getattr(database, name)
+
+        if name.startswith("SQL_CREATE_"):
+            for triggerName, body in PAT_TRIGGER.findall(script):
+                body = PAT_ROW_REFERENCE.sub("?", body)
+                for index, sql in enumerate(splitStatements(body)):
+                    yield f"{name}:{triggerName}[{index}]", name, sql
+            continue
+
+        # Schema changes made by the migrations have no plan
+        if name in ("SQL_COMMIT", "SQL_ADD_CHANGE_SEQUENCE_COLUMN"):
+            continue
+
+        if name in values:
+            for index, formatValues in enumerate(values[name]):
+                yield f"{name}[{index}]", name, script.format(**formatValues)
+        else:
+            yield name, name, script
+
+def explain(dbConn: sqlite3.Connection, sql: str) -> list:
+    params = [None] * sql.count("?")
+    return [row[3] for row in
+            dbConn.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()]
+
+def problems(sql: str, plan: list) -> list:
+    aliases = {alias: table for table, alias in PAT_TABLE_ALIAS.findall(sql)}
+    found = []
+    for detail in plan:
+        if PAT_TEMP_SORT.search(detail):
+            found.append(detail)
+            continue
+
+        match = PAT_TABLE_SCAN.match(detail)
+        if match is None:
+            continue
+
+        # Walking an index in order is fine when LIMIT stops the walk
+        table = aliases.get(match.group(1), match.group(1))
+        if match.group(2) and PAT_LIMIT.search(sql):
+            continue
+        if table not in SMALL_TABLES:
+            found.append(detail)
+
+    return found
+
+def populate(dbPath: str, words: int, seed: int):
+    dbConn = database.Connection(dbPath)
+    dbConn.insertWordDetail(benchmark.generateWords(words, seed))
+    database.getPool(dbPath).close()
+
+def check(dbPath: str, verbose: bool=False, log=sys.stdout) -> int:
+    """ Plan every statement against `dbPath` and return the failure count """
+
+    dbConn = sqlite3.connect(dbPath, isolation_level=None)
+    dbConn.execute(database.SQL_CREATE_STAGE_WORD_TABLE)
+    dbConn.execute(database.SQL_CREATE_STAGE_MEANING_TABLE)
+
+    failures = 0
+
+    try:
+        for name, exemptName, sql in iterStatements():
+            plan = explain(dbConn, sql)
+            found = problems(sql, plan)
+
+            if not found:
+                status = "ok"
+            elif exemptName in EXEMPT:
+                status = "exempt"
+            else:
+                status = "FAIL"
+                failures += 1
+
+            print(f"{status:6} {name}", file=log)
+            if status == "exempt":
+                print(f"       ({EXEMPT[exemptName]})", file=log)
+            if status == "FAIL" or verbose:
+                for detail in (plan if verbose else found):
+                    print(f"       {detail}", file=log)
+
+    finally:
+        dbConn.close()
+
+    return failures
+
+def main(argv: list | None=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m flashcard.queryplan",
+        description="Fail when a statement scans a table or sorts in a "
+                    "temporary B-tree")
+    parser.add_argument("--words", type=int, default=2000,
+                        help="number of generated words to plan against")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--verbose", action="store_true",
+                        help="print the full plan of every statement")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tempDir:
+        dbPath = os.path.join(tempDir, "queryplan.db")
+        populate(dbPath, args.words, args.seed)
+        failures = check(dbPath, args.verbose)
+
+    print(f"{failures} statements failed", file=sys.stderr)
+
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,32 +1,204 @@
+from . import api
 from . import database
+import itertools
 import flask
 import json
+import time
 
 blueprint = flask.Blueprint("blueprint", __name__)
 
+def getConnection() -> database.Connection:
+    """ Return the database connection bound to the current request
+
+    With a read-only pool, GET and HEAD requests read through it.
+    """
+
+    if "dbConn" not in flask.g:
+        app = flask.current_app
+        extensions = app.extensions
+        pool = extensions.get("flashcard.readPool")
+        if pool is None or flask.request.method not in api.READ_METHODS:
+            pool = extensions["flashcard.pool"]
+        flask.g.dbConn = database.Connection(app.config["DATABASE_PATH"],
+                                             pool,
+                                             extensions["flashcard.cache"],
+                                             extensions["flashcard.accessTimes"],
+                                             extensions["flashcard.writer"])
+
+    return flask.g.dbConn
+
+def releaseConnection(exception=None):
+    dbConn = flask.g.pop("dbConn", None)
+    if dbConn is not None:
+        dbConn.closeDatabase()
+
+def startRequestTimer():
+    flask.g.requestStartTime = time.perf_counter()
+
+def recordRequestTime(response):
+    startTime = flask.g.pop("requestStartTime", None)
+    if startTime is None:
+        return response
+
+    registry = flask.current_app.extensions["flashcard.metrics"]
+    registry.observe("flashcard_request_seconds",
+                     api.requestLabels(flask.request, response),
+                     time.perf_counter() - startTime)
+
+    return response
+
+def metrics():
+    registry = flask.current_app.extensions["flashcard.metrics"]
+
+    response = flask.current_app.response_class(
+        response=registry.render(),
+        content_type=api.METRICS_CONTENT_TYPE,
+    )
+    return response
+
+def conditionalResponse(etag: str, lastModified: int, build):
+    """ Answer 304 if the client is up to date, otherwise call `build` """
+
+    if api.notModified(flask.request, etag, lastModified):
+        response = flask.current_app.response_class(status=304)
+    else:
+        response = build()
+
+    return api.setValidators(response, etag, lastModified)
+
 @blueprint.route("/")
 def index():
     response = flask.render_template("index.html")
     return response
 
+@blueprint.route("/search", methods=["GET"])
+def search():
+    dbConn = getConnection()
+
+    q, max = api.searchArgs(flask.request.args)
+
+    hits = dbConn.searchText(q, max)
+    response = flask.current_app.response_class(
+        response=json.dumps(hits),
+        mimetype="application/json",
+    )
+    return response
+
+@blueprint.route("/sync", methods=["GET"])
+def sync():
+    dbConn = getConnection()
+
+    since, max = api.syncArgs(flask.request.args)
+
+    try:
+        changes = dbConn.fetchChanges(since, max)
+    except ValueError as e:
+        flask.abort(400, str(e))
+
+    response = flask.current_app.response_class(
+        response=json.dumps(changes),
+        mimetype="application/json",
+    )
+    return response
+
+@blueprint.route("/stats", methods=["GET"])
+def stats():
+    dbConn = getConnection()
+
+    days = api.statsArgs(flask.request.args)
+
+    result = dbConn.fetchStats(days)
+
+    def build():
+        return flask.current_app.response_class(
+            response=json.dumps(result),
+            mimetype="application/json",
+        )
+
+    etag, lastModified = api.statsValidators(days, result)
+    return conditionalResponse(etag, lastModified, build)
+
+@blueprint.route("/review/next", methods=["GET"])
+def review_next():
+    dbConn = getConnection()
+
+    n = api.reviewArgs(flask.request.args)
+
+    cards = dbConn.fetchDueCards(n)
+    response = flask.current_app.response_class(
+        response=json.dumps(cards),
+        mimetype="application/json",
+    )
+    return response
+
+@blueprint.route("/review/answer", methods=["POST"])
+def review_answer():
+    dbConn = getConnection()
+
+    answers = api.checkBatch(flask.request.get_json(silent=True))
+
+    result = dbConn.answerCards(answers)
+    response = flask.current_app.response_class(
+        response=json.dumps(result),
+        mimetype="application/json",
+    )
+    return response
+
 @blueprint.route("/words", methods=["GET", "POST"])
 def words():
     dbPath = flask.current_app.config["DATABASE_PATH"]
-    dbConn = database.Connection(dbPath)
-
-    max = flask.request.args.get("max", default=10, type=int)
-    sort = flask.request.args.get("sort", default="time", type=str)
+    dbConn = getConnection()
 
-    sortByTime = True if sort == "time" else False
+    max, sort, order, after, ids, stream = api.listArgs(flask.request.args)
+    stream = stream or api.prefersNdjson(flask.request.accept_mimetypes)
 
     method = flask.request.method
-    if method == "GET":
-        words = dbConn.fetchWords(max, sortByTime)
+    if method == "GET" and stream:
+        chunks = dbConn.iterWords(sort, order, after, max)
+        try:
+            # Check the parameters before the response starts
+            first = next(chunks, [])
+        except ValueError as e:
+            flask.abort(400, str(e))
+
+        def generate():
+            try:
+                for chunk in itertools.chain([first], chunks):
+                    yield api.ndjsonLines(chunk)
+            finally:
+                chunks.close()
+
         response = flask.current_app.response_class(
-            response=json.dumps(words),
+            response=generate(),
+            mimetype=api.NDJSON_MIMETYPE,
+        )
+        return response
+    elif method == "GET" and ids is not None:
+        result = dbConn.fetchWordsByIds(api.parseIds(ids))
+        response = flask.current_app.response_class(
+            response=json.dumps(result),
             mimetype="application/json",
         )
         return response
+    elif method == "GET":
+        def build():
+            try:
+                page = dbConn.fetchWordsPage(10 if max is None else max,
+                                             sort, order, after)
+            except ValueError as e:
+                flask.abort(400, str(e))
+
+            response = flask.current_app.response_class(
+                response=json.dumps(page["words"]),
+                mimetype="application/json",
+            )
+            if page["next"] is not None:
+                response.headers["X-Next-Cursor"] = page["next"]
+            return response
+
+        etag, lastModified = api.listValidators(dbConn.fetchChangeState(),
+                                                sort)
+        return conditionalResponse(etag, lastModified, build)
     elif method == "POST":
         word = flask.request.get_json()
         result = dbConn.insertWord(word)
@@ -40,19 +212,94 @@ def words():
 
     return dbPath
 
+@blueprint.route("/words:batch", methods=["POST", "DELETE"])
+def words_batch():
+    dbConn = getConnection()
+
+    items = api.checkBatch(flask.request.get_json(silent=True))
+
+    method = flask.request.method
+    if method == "POST":
+        result = dbConn.insertWords(items)
+    else:
+        result = dbConn.deleteWordsById(api.checkWordIds(items))
+
+    response = flask.current_app.response_class(
+        response=json.dumps(result),
+        mimetype="application/json",
+    )
+    return response
+
+@blueprint.route("/words/suggest", methods=["GET"])
+def words_suggest():
+    dbConn = getConnection()
+
+    prefix, max = api.suggestArgs(flask.request.args)
+
+    words = dbConn.suggestWords(prefix, max)
+    response = flask.current_app.response_class(
+        response=json.dumps(words),
+        mimetype="application/json",
+    )
+    return response
+
+@blueprint.route("/words/similar", methods=["GET"])
+def words_similar():
+    dbConn = getConnection()
+
+    word, distance, max = api.similarArgs(flask.request.args)
+
+    words = dbConn.searchSimilarWords(word, distance, max)
+    response = flask.current_app.response_class(
+        response=json.dumps(words),
+        mimetype="application/json",
+    )
+    return response
+
+@blueprint.route("/words/random", methods=["GET"])
+def words_random():
+    dbConn = getConnection()
+
+    n, seed, having = api.randomArgs(flask.request.args)
+
+    words = dbConn.sampleWords(n, seed, having)
+    response = flask.current_app.response_class(
+        response=json.dumps(words),
+        mimetype="application/json",
+    )
+    return response
+
+@blueprint.route("/words/details", methods=["GET"])
+def words_details():
+    dbConn = getConnection()
+
+    ids = flask.request.args.get("ids", default="", type=str)
+
+    words = dbConn.fetchWordsDetail(api.parseIds(ids))
+    response = flask.current_app.response_class(
+        response=json.dumps(words),
+        mimetype="application/json",
+    )
+    return response
+
 @blueprint.route("/words/<int:wordId>", methods=["GET", "PUT", "DELETE"])
 def words_detail(wordId: int):
     dbPath = flask.current_app.config["DATABASE_PATH"]
-    dbConn = database.Connection(dbPath)
+    dbConn = getConnection()
 
     method = flask.request.method
     if method == "GET":
-        result = dbConn.fetchWordById(wordId)
-        response = flask.current_app.response_class(
-            response=json.dumps(result),
-            mimetype="application/json",
-        )
-        return response
+        def build():
+            result = dbConn.fetchWordDetail(wordId)
+            response = flask.current_app.response_class(
+                response=json.dumps(result),
+                mimetype="application/json",
+            )
+            return response
+
+        etag, lastModified = api.wordValidators(wordId,
+                                                dbConn.fetchChangeState(wordId))
+        return conditionalResponse(etag, lastModified, build)
     elif method == "PUT":
         pass
     elif method == "DELETE":
@@ -0,0 +1,85 @@
+""" Serve the app from one worker process per CPU core
+
+Usage:
+
+    python -m flashcard.serve DB_PATH [--workers N] [--bind HOST:PORT]
+                                      [--asgi]
+
+The same apps can be served by Hypercorn directly:
+
+    hypercorn --workers 4 "flashcard.serve:createApp('/path/to/word.db')"
+
+Every worker builds its own app, with its own connection pools, cache and
+background threads, on the shared database; nothing is created before the
+workers start, so no SQLite connection or thread crosses a fork. The apps
+are configured by `PRODUCTION_CONFIG` for several processes writing to one
+database: WAL lets readers run alongside the one writer, GET requests read
+through read-only connections, writes take the write lock up front with
+BEGIN IMMEDIATE and are retried with backoff when it stays taken past the
+busy timeout, and each worker clears its cache when another one changes
+the words. `python -m flashcard.stress` exercises this setup. It needs
+Hypercorn.
+"""
+
+from . import database
+import argparse
+import os
+import sys
+
+PRODUCTION_CONFIG = {
+    "DATABASE_PRAGMAS": dict(database.DEFAULT_PRAGMAS, journal_mode="WAL"),
+    "DATABASE_READ_ONLY_GETS": True,
+    "CACHE_WATCH_INTERVAL": database.DEFAULT_WATCH_INTERVAL,
+}
+
+def createApp(dbPath: str, config: dict | None=None):
+    """ Build the app of `flashcard.createApp` with `PRODUCTION_CONFIG` """
+
+    import flashcard
+
+    return flashcard.createApp(dbPath,
+                               dict(PRODUCTION_CONFIG, **(config or {})))
+
+def createAsgiApp(dbPath: str, config: dict | None=None):
+    """ Build the app of `flashcard.createAsgiApp` with `PRODUCTION_CONFIG` """
+
+    import flashcard
+
+    return flashcard.createAsgiApp(dbPath,
+                                   dict(PRODUCTION_CONFIG, **(config or {})))
+
+def prepareDatabase(dbPath: str):
+    """ Create and migrate the database once, before any worker opens it """
+
+    pragmas = PRODUCTION_CONFIG["DATABASE_PRAGMAS"]
+    pool = database.ConnectionPool(dbPath, size=1, pragmas=pragmas)
+    pool.close()
+
+def main(argv: list | None=None) -> int:
+    import hypercorn.config
+    import hypercorn.run
+
+    parser = argparse.ArgumentParser(prog="python -m flashcard.serve",
+        description="Serve the app from several worker processes")
+    parser.add_argument("dbPath")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="worker processes, one per CPU core by default")
+    parser.add_argument("--bind", default="127.0.0.1:8000")
+    parser.add_argument("--asgi", action="store_true",
+                        help="serve the async app of flashcard.createAsgiApp")
+    args = parser.parse_args(argv)
+
+    dbPath = os.path.abspath(args.dbPath)
+    prepareDatabase(dbPath)
+
+    factory = "createAsgiApp" if args.asgi else "createApp"
+
+    config = hypercorn.config.Config()
+    config.bind = [args.bind]
+    config.workers = args.workers
+    config.application_path = f"flashcard.serve:{factory}({dbPath!r})"
+
+    return hypercorn.run.run(config)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,234 @@
+""" Stress one database from several processes at once
+
+Usage:
+
+    python -m flashcard.stress [--processes N] [--seconds N] [--words N]
+                               [--writes F] [--seed N] [--output PATH]
+
+A database is filled with N generated words in a temporary directory. Then
+every process builds the app of `flashcard.serve.createApp` on it, as the
+workers of a production server would, and sends it a random mix of reads
+and writes through the test client until the time is up; a fraction F of
+the requests write. Results are written as JSON, with the latency
+percentiles of every request in milliseconds and the lock retries of every
+process. The exit status is 1 when any request failed, or when the tables
+disagree afterwards with the counters that the triggers keep, so the test
+can gate a release.
+"""
+
+from . import benchmark
+from . import database
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+READS = ("GET /words", "GET /words/<id>", "GET /words/random", "GET /search",
+         "GET /stats", "GET /review/next")
+
+WRITES = ("POST /words", "POST /words:batch", "DELETE /words/<id>",
+          "POST /review/answer")
+
+def worker(dbPath: str, process: int, seconds: float, writes: float,
+           seed: int) -> dict:
+    """ Drive one app with random requests for `seconds` seconds """
+
+    from . import serve
+
+    app = serve.createApp(dbPath, {"METRICS_ENABLED": True})
+    client = app.test_client()
+    registry = app.extensions["flashcard.metrics"]
+    generator = random.Random(seed * 1000 + process)
+
+    words = benchmark.loadWords(dbPath)
+    wordIds = [wordId for wordId, _ in words]
+    texts = [wordText for _, wordText in words]
+    created = []
+    counter = 0
+
+    def request(name: str):
+        nonlocal counter
+
+        if name == "GET /words":
+            return client.get("/words?max=20")
+        elif name == "GET /words/<id>":
+            return client.get(f"/words/{generator.choice(wordIds)}")
+        elif name == "GET /words/random":
+            return client.get("/words/random?n=10")
+        elif name == "GET /search":
+            return client.get("/search?q=" + generator.choice(texts))
+        elif name == "GET /stats":
+            return client.get("/stats")
+        elif name == "GET /review/next":
+            return client.get("/review/next?n=20")
+
+        counter += 1
+        text = f"stress{process}x{counter}"
+        if name == "POST /words":
+            response = client.post("/words", json={"wordText": text})
+            if response.status_code == 200:
+                created.append(response.get_json()["wordId"])
+        elif name == "POST /words:batch":
+            response = client.post("/words:batch", json=[
+                {"wordText": f"{text}y{index}"} for index in range(10)])
+            if response.status_code == 200:
+                created.extend(item["wordId"] for item in response.get_json()
+                               if item["status"] == "created")
+        elif name == "DELETE /words/<id>":
+            # Only words of this process, so that deletes never collide
+            wordId = created.pop() if created else 0
+            response = client.delete(f"/words/{wordId}")
+        else:
+            response = client.post("/review/answer", json=[
+                {"wordId": generator.choice(wordIds),
+                 "grade": generator.randrange(6)}])
+        return response
+
+    latencies = {name: [] for name in READS + WRITES}
+    errors = {}
+
+    startTime = time.perf_counter()
+    while time.perf_counter() - startTime < seconds:
+        if generator.random() < writes:
+            name = generator.choice(WRITES)
+        else:
+            name = generator.choice(READS)
+
+        callTime = time.perf_counter()
+        try:
+            status = request(name).status_code
+        except Exception as e:
+            status = type(e).__name__
+        latencies[name].append(time.perf_counter() - callTime)
+
+        if not isinstance(status, int) or status >= 500:
+            key = f"{name}: {status}"
+            errors[key] = errors.get(key, 0) + 1
+
+    for key in ("flashcard.changeWatcher", "flashcard.accessTimes",
+                "flashcard.writer"):
+        if app.extensions[key] is not None:
+            app.extensions[key].close()
+
+    return {
+        "latencies": latencies,
+        "errors": errors,
+        "lockRetries": registry.total("flashcard_lock_retries_total"),
+        "lockErrors": registry.total("flashcard_lock_errors_total"),
+    }
+
+def consistency(dbPath: str) -> list:
+    """ Compare the trigger-kept counters with the tables """
+
+    dbConn = sqlite3.connect(dbPath)
+    try:
+        problems = []
+
+        result = dbConn.execute("PRAGMA integrity_check;").fetchone()[0]
+        if result != "ok":
+            problems.append(f"integrity check: {result}")
+
+        counters = dbConn.execute(
+            "SELECT wordCount, meaningCount, sentenceCount FROM statsTable;"
+        ).fetchone()
+        for table, counter in zip(("wordTable", "meaningTable",
+                                   "sentenceTable"), counters):
+            count = dbConn.execute(f"SELECT count(*) FROM {table};"
+                                   ).fetchone()[0]
+            if count != counter:
+                problems.append(f"{table} has {count} rows, counted {counter}")
+
+        words, states = dbConn.execute(
+            "SELECT (SELECT count(*) FROM wordTable), "
+            "(SELECT count(*) FROM reviewStateTable);").fetchone()
+        if words != states:
+            problems.append(f"{words} words have {states} review states")
+
+        return problems
+
+    finally:
+        dbConn.close()
+
+def stress(dbPath: str, processes: int, seconds: float, writes: float,
+           seed: int) -> dict:
+    # Spawn, like the workers of a server, so nothing is shared by a fork
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(processes) as pool:
+        reports = pool.starmap(worker, [(dbPath, process, seconds, writes,
+                                         seed)
+                                        for process in range(processes)])
+
+    results = {}
+    for name in READS + WRITES:
+        latencies = [latency for report in reports
+                     for latency in report["latencies"][name]]
+        results[name] = benchmark.summarize(latencies)
+
+    errors = {}
+    for report in reports:
+        for key, count in report["errors"].items():
+            errors[key] = errors.get(key, 0) + count
+
+    results["total"] = benchmark.summarize(
+        [latency for report in reports
+         for values in report["latencies"].values() for latency in values],
+        seconds)
+    results["errors"] = errors
+    results["lockRetries"] = [report["lockRetries"] for report in reports]
+    results["lockErrors"] = [report["lockErrors"] for report in reports]
+    results["problems"] = consistency(dbPath)
+
+    return results
+
+def main(argv: list | None=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m flashcard.stress",
+        description="Send concurrent reads and writes from several processes "
+                    "to one database")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 2,
+                        help="worker processes, one per CPU core by default")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--words", type=int, default=2000,
+                        help="number of generated words to start with")
+    parser.add_argument("--writes", type=float, default=0.2,
+                        help="fraction of the requests that write")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None,
+                        help="write the JSON results here instead of stdout")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tempDir:
+        dbPath = os.path.join(tempDir, "stress.db")
+        dbConn = database.Connection(dbPath)
+        dbConn.insertWordDetail(benchmark.generateWords(args.words, args.seed))
+        database.getPool(dbPath).close()
+
+        results = stress(dbPath, args.processes, args.seconds, args.writes,
+                         args.seed)
+
+    results["parameters"] = {
+        "processes": args.processes,
+        "seconds": args.seconds,
+        "words": args.words,
+        "writes": args.writes,
+        "seed": args.seed,
+    }
+
+    output = json.dumps(results, indent=2)
+    if args.output is None:
+        print(output)
+    else:
+        with open(args.output, "w") as outputFile:
+            outputFile.write(output + "\n")
+
+    failures = sum(results["errors"].values()) + len(results["problems"])
+    print(f"{failures} failures", file=sys.stderr)
+
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
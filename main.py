@@ -85,11 +85,15 @@ class DbConn(object):
         """
 
     SQL_QUERY_MEANING_ID = """
-        SELECT meaningId FROM meaningTable WHERE meaningText = ?;
+        SELECT meaningId
+            FROM meaningTable
+            WHERE wordId = ? AND meaningText = ?;
         """
 
     SQL_QUERY_SENTENCE_ID = """
-        SELECT sentenceId FROM sentenceTable WHERE sentenceText = ?;
+        SELECT sentenceId
+            FROM sentenceTable
+            WHERE meaningId = ? AND sentenceText = ?;
         """
 
     def __init__(self, dbPath: str) -> None:
@@ -117,7 +121,8 @@ class DbConn(object):
     def insertSentence(self, sentence: str):
 
         # Insert sentence if necessary
-        self._dbCurs.execute(DbConn.SQL_QUERY_SENTENCE_ID, (sentence,))
+        self._dbCurs.execute(DbConn.SQL_QUERY_SENTENCE_ID,
+                             (self._meaningId, sentence))
         result = self._dbCurs.fetchone()
         if result is None:
             self._dbCurs.execute(DbConn.SQL_INSERT_SENTENCE,
@@ -128,7 +133,8 @@ class DbConn(object):
         meaningSentences = meaning["sentences"]
 
         # Insert meaning if necessary
-        self._dbCurs.execute(DbConn.SQL_QUERY_MEANING_ID, (meaningText,))
+        self._dbCurs.execute(DbConn.SQL_QUERY_MEANING_ID,
+                             (self._wordId, meaningText))
         result = self._dbCurs.fetchone()
         if result is not None:
             self._meaningId = result[0]
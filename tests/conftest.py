@@ -0,0 +1,30 @@
+import flashcard
+import pytest
+
+@pytest.fixture
+def app(tmp_path):
+    app = flashcard.createApp(str(tmp_path / "word.db"))
+
+    yield app
+
+    # Background threads first, since they write through the pools
+    for key in ("flashcard.changeWatcher", "flashcard.accessTimes",
+                "flashcard.writer", "flashcard.readPool", "flashcard.pool"):
+        extension = app.extensions.get(key)
+        if extension is not None:
+            extension.close()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+def addWords(client, texts: list) -> list:
+    """ Add words through POST /words and return their ids """
+
+    wordIds = []
+    for text in texts:
+        response = client.post("/words", json={"wordText": text})
+        assert response.status_code == 200
+        wordIds.append(response.get_json()["wordId"])
+
+    return wordIds
@@ -0,0 +1,59 @@
+from conftest import addWords
+import time
+import werkzeug.http
+
+def test_list_etag(client):
+    addWords(client, ["alpha"])
+
+    response = client.get("/words?sort=text")
+    etag = response.headers["ETag"]
+    assert response.status_code == 200
+
+    response = client.get("/words?sort=text", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+
+    addWords(client, ["beta"])
+
+    response = client.get("/words?sort=text", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert [word["wordText"] for word in response.get_json()] == ["alpha",
+                                                                  "beta"]
+
+def test_word_etag(client):
+    wordId, = addWords(client, ["alpha"])
+
+    etag = client.get(f"/words/{wordId}").headers["ETag"]
+    response = client.get(f"/words/{wordId}",
+                          headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+    client.delete(f"/words/{wordId}")
+
+    response = client.get(f"/words/{wordId}",
+                          headers={"If-None-Match": etag})
+    assert response.status_code == 200
+
+def test_if_modified_since(client):
+    addWords(client, ["alpha"])
+
+    later = werkzeug.http.http_date(time.time() + 3600)
+    response = client.get("/words", headers={"If-Modified-Since": later})
+    assert response.status_code == 304
+
+    earlier = werkzeug.http.http_date(time.time() - 3600)
+    response = client.get("/words", headers={"If-Modified-Since": earlier})
+    assert response.status_code == 200
+
+def test_access_sort_etag_follows_access_flushes(app, client):
+    wordId, = addWords(client, ["alpha"])
+
+    etag = client.get("/words?sort=access").headers["ETag"]
+    assert client.get("/words?sort=text").headers["ETag"] != etag
+
+    client.get(f"/words/{wordId}")
+    app.extensions["flashcard.accessTimes"].flush()
+
+    response = client.get("/words?sort=access",
+                          headers={"If-None-Match": etag})
+    assert response.status_code == 200
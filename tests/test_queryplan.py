@@ -0,0 +1,9 @@
+from flashcard import queryplan
+import io
+
+def test_every_statement_uses_an_index(tmp_path):
+    dbPath = str(tmp_path / "queryplan.db")
+    queryplan.populate(dbPath, 500, 0)
+
+    log = io.StringIO()
+    assert queryplan.check(dbPath, log=log) == 0, log.getvalue()
@@ -0,0 +1,29 @@
+from conftest import addWords
+import pytest
+
+@pytest.mark.parametrize("url", [
+    "/words/suggest?prefix=wo&max=0",
+    "/words/suggest?prefix=wo&max=-1",
+    "/words/similar?word=wrd&max=-1",
+    "/words/similar?word=wrd&distance=-1",
+    "/words/similar?word=wrd&distance=4",
+    "/search?q=word&max=-1",
+    "/search?q=word&max=1001",
+])
+def test_bad_arguments(client, url):
+    addWords(client, ["word"])
+
+    assert client.get(url).status_code == 400
+
+def test_suggest(client):
+    addWords(client, ["Apple", "apricot", "banana"])
+
+    response = client.get("/words/suggest?prefix=ap")
+    assert [word["wordText"] for word in response.get_json()] == ["Apple",
+                                                                  "apricot"]
+
+def test_similar(client):
+    addWords(client, ["receive", "recipe", "deceive"])
+
+    response = client.get("/words/similar?word=recieve&distance=1")
+    assert [word["wordText"] for word in response.get_json()] == ["receive"]
@@ -0,0 +1,15 @@
+from flashcard import benchmark
+from flashcard import database
+from flashcard import stress
+
+def test_concurrent_processes(tmp_path):
+    dbPath = str(tmp_path / "stress.db")
+    dbConn = database.Connection(dbPath)
+    dbConn.insertWordDetail(benchmark.generateWords(500, 0))
+    database.getPool(dbPath).close()
+
+    results = stress.stress(dbPath, processes=2, seconds=2.0, writes=0.2,
+                            seed=0)
+
+    assert results["errors"] == {}
+    assert results["problems"] == []
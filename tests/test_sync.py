@@ -0,0 +1,54 @@
+from conftest import addWords
+from flashcard import database
+import pytest
+
+def syncAll(client, since: str | None=None, max: int=2) -> tuple:
+    """ Page through GET /sync; return the changes and the next token """
+
+    changes = {"words": [], "meanings": [], "sentences": [], "deleted": []}
+    while True:
+        url = f"/sync?max={max}" + ("" if since is None else f"&since={since}")
+        response = client.get(url)
+        assert response.status_code == 200
+
+        body = response.get_json()
+        for name in changes:
+            changes[name] += body[name]
+        since = body["next"]
+        if not body["more"]:
+            return changes, since
+
+def test_token_round_trip(client):
+    wordIds = addWords(client, [f"word{index}" for index in range(5)])
+
+    changes, since = syncAll(client)
+    assert sorted(word["wordId"] for word in changes["words"]) == wordIds
+
+    changes, since = syncAll(client, since)
+    assert not any(changes.values())
+
+    newId, = addWords(client, ["word5"])
+    client.delete(f"/words/{wordIds[0]}")
+
+    changes, since = syncAll(client, since)
+    assert [word["wordId"] for word in changes["words"]] == [newId]
+    assert changes["deleted"] == [
+        dict(changes["deleted"][0], type="word", id=wordIds[0])]
+
+    changes, since = syncAll(client, since)
+    assert not any(changes.values())
+
+@pytest.mark.parametrize("since", [
+    "not-a-token",
+    database.encodeToken(["seq", 0, 0, 0, 0]),
+    database.encodeToken(["time", 0, 0, 0, 0, 0]),
+    database.encodeToken(["seq", 0, 1 << 64, 0, 0, 0]),
+    database.encodeToken(["seq", -2, 0, 0, 0, 0]),
+    database.encodeToken(["seq", 0, True, 0, 0, 0]),
+])
+def test_bad_tokens(client, since):
+    assert client.get(f"/sync?since={since}").status_code == 400
+
+@pytest.mark.parametrize("max", [0, -1, 5001])
+def test_bad_max(client, max):
+    assert client.get(f"/sync?max={max}").status_code == 400
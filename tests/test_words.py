@@ -0,0 +1,55 @@
+from conftest import addWords
+from flashcard import database
+import pytest
+
+def fetchAll(client, query: str) -> list:
+    """ Follow the X-Next-Cursor of GET /words until the last page """
+
+    texts = []
+    after = None
+    while True:
+        url = f"/words?{query}" + ("" if after is None else f"&after={after}")
+        response = client.get(url)
+        assert response.status_code == 200
+
+        texts += [word["wordText"] for word in response.get_json()]
+        after = response.headers.get("X-Next-Cursor")
+        if after is None:
+            return texts
+
+def test_cursor_round_trip(client):
+    texts = [f"word{index:02}" for index in range(25)]
+    addWords(client, texts)
+
+    assert fetchAll(client, "sort=text&order=asc&max=10") == texts
+    assert fetchAll(client, "sort=text&order=desc&max=7") == texts[::-1]
+
+def test_cursor_round_trip_with_equal_sort_values(client):
+    # Words added within one second share their times; wordId breaks ties
+    texts = [f"word{index:02}" for index in range(12)]
+    addWords(client, texts)
+
+    assert sorted(fetchAll(client, "sort=creation&max=5")) == texts
+
+@pytest.mark.parametrize("query", [
+    "max=0",
+    "max=-2",
+    "max=1001",
+    "sort=bogus",
+    "order=sideways",
+    "after=not-a-cursor",
+    "after=" + database.encodeCursor("word", True),
+    "after=" + database.encodeCursor(1 << 64, 1),
+    "after=" + database.encodeCursor(["word"], 1),
+])
+def test_bad_arguments(client, query):
+    addWords(client, ["word"])
+
+    assert client.get(f"/words?{query}").status_code == 400
+
+def test_negative_max(app):
+    dbConn = database.Connection(app.config["DATABASE_PATH"],
+                                 app.extensions["flashcard.pool"])
+
+    with pytest.raises(ValueError):
+        dbConn.fetchWordsPage(-1)